@@ -1,36 +1,591 @@
 from PIL import Image
+import numpy as np
+import argparse
+import csv
+import hashlib
+import json
 import os
+import random
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
 
-def calculate_brightness(image):
-    # Convert image to grayscale
-    grayscale_image = image.convert('L')
-    # Calculate average pixel intensity
-    histogram = grayscale_image.histogram()
-    pixels = sum(histogram)
-    brightness = sum(index * value for index, value in enumerate(histogram)) / pixels
-    return brightness
+# Weights used to turn a 256-bin histogram into a mean intensity
+INTENSITY_LEVELS = np.arange(256, dtype=np.float64)
 
-def separate_images_by_brightness(folder_path, threshold=100):
+# Target size for fast mode; a global mean does not need more pixels than this
+FAST_MODE_SIZE = (256, 256)
+
+# Only files with these extensions are opened; everything else is skipped while walking
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff')
+
+# Longest side of the copy used for colour metrics and the perceptual hash
+METRIC_SIZE = 256
+# Side of the grayscale thumbnail transformed by the perceptual hash
+PHASH_SIZE = 32
+
+DEFAULT_CACHE_PATH = 'brightness_cache.sqlite3'
+# Bytes hashed to recognise a file again after it has been moved or renamed
+HASH_PREFIX_BYTES = 64 * 1024
+
+def reduce_for_measurement(image, size=FAST_MODE_SIZE, mode='L'):
+    """Shrink an image to roughly `size` as cheaply as the format allows."""
+    # JPEG decodes straight to a 1/2, 1/4 or 1/8 scale image from the DCT data.
+    # This only works before the pixels are loaded and is a no-op for other formats.
+    image.draft(mode, size)
+    # Formats without draft support (PNG, WebP, ...) are box-reduced after decoding
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor > 1:
+        image = image.convert(mode).reduce(factor)
+    return image
+
+def dct_matrix(n):
+    """Orthonormal DCT-II basis, so a 2-D DCT is two matrix products."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+DCT_MATRIX = dct_matrix(PHASH_SIZE)
+
+class DecodedImage:
+    """One decoded image plus the derived views metrics share, each built on first use."""
+
+    def __init__(self, image):
+        self.image = image
+        self._histogram = None
+        self._small_rgb = None
+
+    @property
+    def histogram(self):
+        """256-bin grayscale histogram of the full decoded image."""
+        if self._histogram is None:
+            self._histogram = np.asarray(self.image.convert('L').histogram(), dtype=np.float64)
+        return self._histogram
+
+    @property
+    def small_rgb(self):
+        """RGB copy no larger than METRIC_SIZE on either side, as a (height, width, 3) uint8 array."""
+        if self._small_rgb is None:
+            small = self.image if self.image.mode in ('L', 'RGB', 'RGBA') else self.image.convert('RGB')
+            factor = max(small.width, small.height) // METRIC_SIZE
+            if factor > 1:
+                small = small.reduce(factor)
+            self._small_rgb = np.asarray(small.convert('RGB'))
+        return self._small_rgb
+
+def metric_brightness(decoded):
+    # Average pixel intensity from the histogram as a vector dot product
+    histogram = decoded.histogram
+    return float(histogram @ INTENSITY_LEVELS / histogram.sum())
+
+def metric_contrast(decoded):
+    # Standard deviation of the grayscale intensities, also straight from the histogram
+    histogram = decoded.histogram
+    pixels = histogram.sum()
+    mean = histogram @ INTENSITY_LEVELS / pixels
+    return float(np.sqrt(histogram @ (INTENSITY_LEVELS - mean) ** 2 / pixels))
+
+def metric_dominant_color(decoded):
+    # Quantise to 4 bits per channel so near-identical colours share a bin,
+    # then report the mean colour of the most populated bin
+    pixels = decoded.small_rgb.reshape(-1, 3)
+    quantized = pixels.astype(np.uint16) >> 4
+    bins = (quantized[:, 0] << 8) | (quantized[:, 1] << 4) | quantized[:, 2]
+    counts = np.bincount(bins, minlength=4096)
+    dominant = pixels[bins == counts.argmax()].mean(axis=0).round().astype(int)
+    return '#{:02x}{:02x}{:02x}'.format(*dominant)
+
+def metric_colorfulness(decoded):
+    # Hasler and Suesstrunk's colourfulness measure on the opponent colour channels
+    pixels = decoded.small_rgb.astype(np.float32)
+    red, green, blue = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    red_green = red - green
+    yellow_blue = 0.5 * (red + green) - blue
+    spread = np.hypot(red_green.std(), yellow_blue.std())
+    offset = np.hypot(red_green.mean(), yellow_blue.mean())
+    return float(spread + 0.3 * offset)
+
+def metric_phash(decoded):
+    # 64-bit DCT perceptual hash: low frequencies of a 32x32 thumbnail compared to their median
+    thumbnail = Image.fromarray(decoded.small_rgb).convert('L').resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BOX)
+    coefficients = DCT_MATRIX @ np.asarray(thumbnail, dtype=np.float64) @ DCT_MATRIX.T
+    low = coefficients[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return np.packbits(bits).tobytes().hex()
+
+# Every metric one decode can produce, keyed by its index column name
+METRICS = {
+    'brightness': metric_brightness,
+    'contrast': metric_contrast,
+    'dominant_color': metric_dominant_color,
+    'colorfulness': metric_colorfulness,
+    'phash': metric_phash,
+}
+METRIC_COLUMN_TYPES = {
+    'brightness': 'REAL',
+    'contrast': 'REAL',
+    'dominant_color': 'TEXT',
+    'colorfulness': 'REAL',
+    'phash': 'TEXT',
+}
+# Metrics that can be computed from a grayscale-only decode
+GRAYSCALE_METRICS = {'brightness', 'contrast', 'phash'}
+
+def calculate_metrics(image, metrics=tuple(METRICS), fast=False):
+    """Compute the named metrics from a single decode of `image`."""
+    if fast:
+        mode = 'L' if GRAYSCALE_METRICS.issuperset(metrics) else 'RGB'
+        image = reduce_for_measurement(image, mode=mode)
+    decoded = DecodedImage(image)
+    return {name: METRICS[name](decoded) for name in metrics}
+
+def calculate_brightness(image, fast=False):
+    return calculate_metrics(image, ('brightness',), fast=fast)['brightness']
+
+def measure_image(image_path, fast=False, metrics=tuple(METRICS)):
+    """Decode one image and return (image_path, metric values, error). Runs inside a worker process."""
+    try:
+        with Image.open(image_path) as image:
+            return image_path, calculate_metrics(image, metrics, fast=fast), None
+    except Exception as e:
+        return image_path, None, str(e)
+
+def compare_image(image_path):
+    """Return (image_path, full_brightness, fast_brightness, error) for one image."""
+    try:
+        # Draft mode changes how the file is decoded, so each measurement needs its own open
+        with Image.open(image_path) as image:
+            full = calculate_brightness(image)
+        with Image.open(image_path) as image:
+            fast = calculate_brightness(image, fast=True)
+        return image_path, full, fast, None
+    except Exception as e:
+        return image_path, None, None, str(e)
+
+def iter_image_paths(folder_path, recursive=False, extensions=IMAGE_EXTENSIONS, skip_dirs=()):
+    """Yield image paths as the directory is read instead of listing it up front."""
+    skip_dirs = {os.path.abspath(directory) for directory in skip_dirs}
+    directories = [folder_path]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and os.path.abspath(entry.path) not in skip_dirs:
+                            directories.append(entry.path)
+                    elif extensions is None or entry.name.lower().endswith(extensions):
+                        yield entry.path
+        except OSError as e:
+            print(f"Error reading {directory}: {e}")
+
+def run_chunk(function, chunk):
+    return [function(item) for item in chunk]
+
+class BoundedPool:
+    """Process pool that is fed one item at a time and pushes back on the producer.
+
+    Items are sent to the workers in chunks to amortise the inter-process overhead,
+    and at most `max_pending` chunks are in flight; `put` blocks until one finishes.
+    """
+
+    def __init__(self, function, workers=None, chunksize=8, max_pending=None):
+        self.function = function
+        self.chunksize = chunksize
+        self.chunk = []
+        self.pending = set()
+        self.ready = []
+        self.executor = None
+        if workers != 1:
+            # ProcessPoolExecutor refuses more than 61 workers on Windows
+            workers = workers or min(os.cpu_count() or 1, 61)
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending or 2 * (workers or 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=exc_type is not None)
+
+    def put(self, item):
+        if self.executor is None:
+            # Skip the pool entirely; useful for debugging and tiny folders
+            self.ready.append(self.function(item))
+            return
+        self.chunk.append(item)
+        if len(self.chunk) >= self.chunksize:
+            self.submit_chunk()
+
+    def submit_chunk(self):
+        while len(self.pending) >= self.max_pending:
+            self.collect(FIRST_COMPLETED)
+        self.pending.add(self.executor.submit(run_chunk, self.function, self.chunk))
+        self.chunk = []
+
+    def collect(self, return_when, timeout=None):
+        done, self.pending = wait(self.pending, timeout=timeout, return_when=return_when)
+        for future in done:
+            self.ready.extend(future.result())
+
+    def drain(self):
+        """Return every result that has finished so far without blocking."""
+        if self.pending:
+            self.collect(FIRST_COMPLETED, timeout=0)
+        ready, self.ready = self.ready, []
+        return ready
+
+    def finish(self):
+        """Yield the remaining results once the producer has run out of items."""
+        if self.chunk:
+            self.submit_chunk()
+        while self.pending:
+            self.collect(FIRST_COMPLETED)
+            yield from self.drain()
+        yield from self.drain()
+
+def run_in_pool(function, items, workers=None):
+    """Yield function(item) for every item in completion order, spreading the calls across a process pool."""
+    with BoundedPool(function, workers=workers) as pool:
+        for item in items:
+            pool.put(item)
+            yield from pool.drain()
+        yield from pool.finish()
+
+def measure_images(image_paths, workers=None, fast=False, metrics=tuple(METRICS)):
+    """Yield (image_path, metric values, error) for every path, decoding across a process pool."""
+    yield from run_in_pool(partial(measure_image, fast=fast, metrics=metrics), image_paths, workers=workers)
+
+def verify_fast_mode(folder_path, tolerance=1.0, sample_size=200, workers=None, recursive=False, extensions=IMAGE_EXTENSIONS):
+    """Compare fast-mode brightness against full decodes on a sample and report the error."""
+    # Reservoir sampling keeps the walk streaming however large the folder is
+    image_paths = []
+    for seen, image_path in enumerate(iter_image_paths(folder_path, recursive, extensions)):
+        if seen < sample_size:
+            image_paths.append(image_path)
+        else:
+            slot = random.randint(0, seen)
+            if slot < sample_size:
+                image_paths[slot] = image_path
+
+    errors = []
+    outliers = []
+    for image_path, full, fast, error in run_in_pool(compare_image, image_paths, workers=workers):
+        if error is not None:
+            print(f"Error processing {os.path.basename(image_path)}: {error}")
+            continue
+        errors.append(abs(full - fast))
+        if errors[-1] > tolerance:
+            outliers.append((image_path, full, fast))
+
+    if not errors:
+        print("No images could be compared.")
+        return False
+
+    errors = np.asarray(errors)
+    print(f"Compared {len(errors)} images: mean error {errors.mean():.3f}, max error {errors.max():.3f} (tolerance {tolerance})")
+    for image_path, full, fast in outliers:
+        print(f"  {os.path.basename(image_path)}: full {full:.2f}, fast {fast:.2f}")
+    return not outliers
+
+def hash_file_prefix(file_path, length=HASH_PREFIX_BYTES):
+    """Return a short content hash of the first `length` bytes of a file."""
+    with open(file_path, 'rb') as f:
+        return hashlib.blake2b(f.read(length), digest_size=16).hexdigest()
+
+class BrightnessCache:
+    """On-disk index of image metrics keyed by (path, size, mtime, content hash prefix)."""
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, rebuild=False):
+        self.connection = sqlite3.connect(cache_path)
+        if rebuild:
+            self.connection.execute("DROP TABLE IF EXISTS images")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT NOT NULL,
+                fast INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash_prefix TEXT NOT NULL,
+                brightness REAL NOT NULL,
+                PRIMARY KEY (path, fast)
+            )
+        """)
+        # Indexes written before a metric existed simply gain an empty column for it
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(images)")}
+        for name, column_type in METRIC_COLUMN_TYPES.items():
+            if name not in columns:
+                self.connection.execute(f"ALTER TABLE images ADD COLUMN {name} {column_type}")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS images_identity ON images (size, hash_prefix, fast)")
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def select_row(self, where, parameters):
+        row = self.connection.execute(
+            f"SELECT size, mtime_ns, hash_prefix, {', '.join(METRICS)} FROM images WHERE {where}",
+            parameters,
+        ).fetchone()
+        if row is None:
+            return None, None
+        return tuple(row[:3]), {name: value for name, value in zip(METRICS, row[3:]) if value is not None}
+
+    def lookup(self, image_path, fast=False, metrics=tuple(METRICS)):
+        """Return (values, identity) for a file; values is None unless every requested metric is cached.
+
+        The identity is what `store` needs to record freshly measured values.
+        """
+        image_path = os.path.abspath(image_path)
+        stat = os.stat(image_path)
+        identity, values = self.select_row("path = ? AND fast = ?", (image_path, int(fast)))
+        # Unchanged size and mtime: trust the entry without reading the file
+        if identity and identity[:2] == (stat.st_size, stat.st_mtime_ns):
+            if all(name in values for name in metrics):
+                return values, identity
+            return None, identity
+
+        identity = (stat.st_size, stat.st_mtime_ns, hash_file_prefix(image_path))
+        # The same file under another name, e.g. one this script moved on an earlier run. Renames keep
+        # the mtime; a size and prefix match alone is not enough, since same-resolution BMP/TIFF
+        # wallpapers with letterbox bars can share their first 64 KiB.
+        _, values = self.select_row(
+            "size = ? AND mtime_ns = ? AND hash_prefix = ? AND fast = ?",
+            (identity[0], identity[1], identity[2], int(fast)),
+        )
+        if values and all(name in values for name in metrics):
+            self.store(image_path, identity, values, fast)
+            return values, identity
+        return None, identity
+
+    def store(self, image_path, identity, values, fast=False):
+        """Record metric values for a file with the identity returned by `lookup`."""
+        image_path = os.path.abspath(image_path)
+        # Keep metrics that were not recomputed this time if the file itself is unchanged
+        stored_identity, stored_values = self.select_row("path = ? AND fast = ?", (image_path, int(fast)))
+        if stored_identity == tuple(identity):
+            values = {**stored_values, **values}
+        columns = ["path", "fast", "size", "mtime_ns", "hash_prefix", *values]
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO images ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (image_path, int(fast), *identity, *values.values()),
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= 500:
+            self.commit()
+
+    def move(self, old_path, new_path):
+        """Follow a file that was renamed so the next run still hits by path."""
+        self.connection.execute(
+            "UPDATE OR REPLACE images SET path = ? WHERE path = ?",
+            (os.path.abspath(new_path), os.path.abspath(old_path)),
+        )
+        self.pending_writes += 1
+
+    def prune(self):
+        """Evict entries for files that no longer exist and return how many were removed."""
+        paths = [row[0] for row in self.connection.execute("SELECT DISTINCT path FROM images")]
+        missing = [(path,) for path in paths if not os.path.exists(path)]
+        self.connection.executemany("DELETE FROM images WHERE path = ?", missing)
+        self.commit()
+        return len(missing)
+
+    def commit(self):
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+def measure_with_cache(image_paths, cache=None, workers=None, fast=False, metrics=tuple(METRICS)):
+    """Yield (image_path, metric values, error), serving unchanged files from the cache."""
+    if cache is None:
+        yield from measure_images(image_paths, workers=workers, fast=fast, metrics=metrics)
+        return
+
+    # Identities of files currently being decoded; bounded by the pool's in-flight window
+    identities = {}
+
+    def store_results(results):
+        for image_path, values, error in results:
+            identity = identities.pop(image_path)
+            if error is None and identity is not None:
+                cache.store(image_path, identity, values, fast)
+            yield image_path, values, error
+
+    with BoundedPool(partial(measure_image, fast=fast, metrics=metrics), workers=workers) as pool:
+        for image_path in image_paths:
+            try:
+                values, identity = cache.lookup(image_path, fast, metrics)
+            except OSError:
+                # Let the decoder report unreadable entries the usual way
+                values, identity = None, None
+            if values is not None:
+                yield image_path, values, None
+            else:
+                identities[image_path] = identity
+                pool.put(image_path)
+            yield from store_results(pool.drain())
+        yield from store_results(pool.finish())
+    cache.commit()
+
+def separate_images_by_brightness(folder_path, threshold=100, workers=None, fast=False, cache=None, recursive=False, extensions=IMAGE_EXTENSIONS, metrics=tuple(METRICS)):
     dark_images_folder = 'dark_images'
     light_images_folder = 'light_images'
-    
+
     os.makedirs(dark_images_folder, exist_ok=True)
     os.makedirs(light_images_folder, exist_ok=True)
-    
-    for filename in os.listdir(folder_path):
+
+    # Never walk into the output folders, or sorted images would be picked up again
+    image_paths = iter_image_paths(folder_path, recursive, extensions, skip_dirs=(dark_images_folder, light_images_folder))
+    start_time = time.perf_counter()
+    processed = 0
+
+    for image_path, values, error in measure_with_cache(image_paths, cache, workers=workers, fast=fast, metrics=metrics):
+        filename = os.path.basename(image_path)
         try:
-            image_path = os.path.join(folder_path, filename)
-            image = Image.open(image_path)
-            brightness = calculate_brightness(image)
-            
-            if brightness < threshold:
-                os.rename(image_path, os.path.join(dark_images_folder, filename))
+            if error is not None:
+                raise Exception(error)
+
+            if values['brightness'] < threshold:
+                destination = os.path.join(dark_images_folder, filename)
             else:
-                os.rename(image_path, os.path.join(light_images_folder, filename))
-        
+                destination = os.path.join(light_images_folder, filename)
+            # Recursive walks can meet the same filename twice; never overwrite a sorted image
+            if os.path.exists(destination):
+                raise FileExistsError(f"{destination} already exists")
+            os.rename(image_path, destination)
+            if cache is not None:
+                cache.move(image_path, destination)
+            processed += 1
+
         except Exception as e:
             print(f"Error processing {filename}: {str(e)}")
 
-# Example usage
-folder_path = 'D:\Images\Wallpapers'
-separate_images_by_brightness(folder_path, threshold=100)
+    elapsed = time.perf_counter() - start_time
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Sorted {processed} images in {elapsed:.1f}s ({rate:.1f} images/s)")
+
+    if cache is not None:
+        evicted = cache.prune()
+        if evicted:
+            print(f"Evicted {evicted} cache entries for files that no longer exist")
+
+def brightness_report(folder_path, thresholds, cache=None, workers=None, fast=False, bins=16, recursive=False, extensions=IMAGE_EXTENSIONS, metrics=tuple(METRICS)):
+    """Measure every image once and summarise how each threshold would split them. Moves nothing."""
+    image_paths = iter_image_paths(folder_path, recursive, extensions)
+    start_time = time.perf_counter()
+
+    listing = []
+    for image_path, values, error in measure_with_cache(image_paths, cache, workers=workers, fast=fast, metrics=metrics):
+        if error is not None:
+            print(f"Error processing {os.path.basename(image_path)}: {error}")
+            continue
+        listing.append({"path": image_path, **{name: values[name] for name in metrics}})
+
+    elapsed = time.perf_counter() - start_time
+    values = np.sort(np.fromiter((item["brightness"] for item in listing), dtype=np.float64, count=len(listing)))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    # Images below a threshold are dark, so a left-sided search counts them for every threshold at once
+    dark_counts = np.searchsorted(values, thresholds, side='left')
+    histogram, edges = np.histogram(values, bins=bins, range=(0, 256))
+
+    return {
+        "folder": folder_path,
+        "metrics": list(metrics),
+        "images": len(values),
+        "seconds": elapsed,
+        "mean": float(values.mean()) if len(values) else None,
+        "median": float(np.median(values)) if len(values) else None,
+        "distribution": [
+            {"from": float(edges[i]), "to": float(edges[i + 1]), "count": int(histogram[i])}
+            for i in range(len(histogram))
+        ],
+        "thresholds": [
+            {"threshold": float(threshold), "dark": int(dark), "light": int(len(values) - dark)}
+            for threshold, dark in zip(thresholds, dark_counts)
+        ],
+        "listing": listing,
+    }
+
+def print_report(report):
+    """Print the distribution and threshold sweep of a brightness report."""
+    rate = report["images"] / report["seconds"] if report["seconds"] > 0 else 0.0
+    print(f"Measured {report['images']} images in {report['seconds']:.1f}s ({rate:.1f} images/s)")
+    if not report["images"]:
+        return
+    print(f"Mean brightness {report['mean']:.1f}, median {report['median']:.1f}")
+
+    print("\nDistribution:")
+    largest = max(bucket["count"] for bucket in report["distribution"]) or 1
+    for bucket in report["distribution"]:
+        bar = "#" * round(40 * bucket["count"] / largest)
+        print(f"  {bucket['from']:5.0f}-{bucket['to']:<5.0f} {bucket['count']:7d} {bar}")
+
+    print("\nThreshold sweep:")
+    print(f"  {'threshold':>9} {'dark':>7} {'light':>7}")
+    for row in report["thresholds"]:
+        print(f"  {row['threshold']:9g} {row['dark']:7d} {row['light']:7d}")
+
+def write_report(report, output_path):
+    """Write the per-image listing as CSV, or the whole report as JSON, based on the file extension."""
+    if output_path.lower().endswith('.csv'):
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=["path", *report["metrics"]])
+            writer.writeheader()
+            writer.writerows(report["listing"])
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(f"Report written to {output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sort images into dark and light folders by average brightness.")
+    parser.add_argument("folder_path", nargs="?", default=r'D:\Images\Wallpapers', help="Folder containing the images to sort")
+    parser.add_argument("--threshold", type=float, default=100, help="Images darker than this (0-255) are treated as dark")
+    parser.add_argument("--workers", type=int, default=None, help="Number of decoder processes (default: one per CPU)")
+    parser.add_argument("--recursive", action="store_true", help="Also process images in subfolders")
+    parser.add_argument("--extensions", default=",".join(IMAGE_EXTENSIONS), help="Comma-separated file extensions to process, or '*' for every file")
+    parser.add_argument("--fast", action="store_true", help="Measure on a downscaled decode instead of every pixel")
+    parser.add_argument("--metrics", default=",".join(METRICS), help=f"Comma-separated metrics to compute and index per decode ({', '.join(METRICS)})")
+    parser.add_argument("--verify", action="store_true", help="Only check fast-mode accuracy against full decodes on a sample")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Maximum allowed fast-mode brightness error for --verify")
+    parser.add_argument("--sample", type=int, default=200, help="Number of images checked by --verify")
+    parser.add_argument("--report", action="store_true", help="Dry run: measure everything and report a threshold sweep without moving files")
+    parser.add_argument("--sweep", type=float, nargs=3, default=(40, 200, 10), metavar=("START", "STOP", "STEP"), help="Thresholds evaluated by --report (STOP is inclusive)")
+    parser.add_argument("--output", help="Write the --report listing to a .csv or .json file")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Brightness cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Measure every image without reading or writing the cache")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the cache and measure every image again")
+    args = parser.parse_args()
+    # Brightness drives the sorting, so it is always computed
+    metrics = ('brightness', *(name.strip() for name in args.metrics.split(",") if name.strip() and name.strip() != 'brightness'))
+    unknown = [name for name in metrics if name not in METRICS]
+    if unknown:
+        parser.error(f"unknown metrics: {', '.join(unknown)}")
+    extensions = None if args.extensions == "*" else tuple(ext.strip().lower() for ext in args.extensions.split(",") if ext.strip())
+
+    if args.verify:
+        ok = verify_fast_mode(args.folder_path, args.tolerance, args.sample, workers=args.workers, recursive=args.recursive, extensions=extensions)
+        raise SystemExit(0 if ok else 1)
+
+    cache = None if args.no_cache else BrightnessCache(args.cache, rebuild=args.rebuild)
+    try:
+        if args.report:
+            start, stop, step = args.sweep
+            thresholds = np.arange(start, stop + step / 2, step)
+            report = brightness_report(args.folder_path, thresholds, cache, workers=args.workers, fast=args.fast, recursive=args.recursive, extensions=extensions, metrics=metrics)
+            print_report(report)
+            if args.output:
+                write_report(report, args.output)
+            return
+        separate_images_by_brightness(args.folder_path, threshold=args.threshold, workers=args.workers, fast=args.fast, cache=cache, recursive=args.recursive, extensions=extensions, metrics=metrics)
+    finally:
+        if cache is not None:
+            cache.close()
+
+if __name__ == '__main__':
+    main()
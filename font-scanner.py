@@ -1,105 +1,966 @@
+import argparse
+import hashlib
+import itertools
+import json
 import os
+import random
+import time
+from functools import lru_cache
 from fontTools.ttLib import TTFont
 import pyperclip
 import re
+import sqlite3
+import struct
 import sys
+import tracemalloc
+import zlib
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+from fontTools.ttLib import TTCollection
+from fontTools.ttLib.woff2 import woff2KnownTags
 
+try:
+    import brotli
+except ImportError:
+    brotli = None  # WOFF2 fonts are reported as errors without it
+
+# Supported font file extensions
+SUPPORTED_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.otc', '.woff', '.woff2')
+
+# sfntVersion values of plain TrueType/OpenType files whose table directory we can read directly
+SFNT_VERSIONS = (b'\x00\x01\x00\x00', b'OTTO', b'true', b'typ1')
+
+# Compressed data is fed to the WOFF2 decompressor in chunks of this size
+WOFF2_READ_SIZE = 64 * 1024
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'FontScanner',
+    'font_cache.sqlite3',
+)
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), 'font_catalog.sqlite3')
+
+# Tables read for each face when building the catalog
+CATALOG_TABLES = {b'name', b'OS/2', b'head', b'maxp', b'fvar'}
+
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL = 2.0
+
+# Files whose sizes collide are first compared by a hash of this many leading bytes
+HASH_PREFIX_BYTES = 64 * 1024
+
+# Name records that identify a face: family, subfamily, unique ID, version and PostScript name
+FINGERPRINT_NAME_IDS = (1, 2, 3, 5, 6)
+
+# Per-face catalog columns and their SQLite types
+FACE_COLUMNS = {
+    'family': 'TEXT',
+    'subfamily': 'TEXT',
+    'typographic_family': 'TEXT',
+    'weight_class': 'INTEGER',
+    'width_class': 'INTEGER',
+    'italic': 'INTEGER',
+    'glyph_count': 'INTEGER',
+    'variable': 'INTEGER',
+    'weight_min': 'INTEGER',
+    'weight_max': 'INTEGER',
+}
+
+# Common variation suffixes stripped from family names (e.g., "Light", "Bold", "Medium", etc.)
+STYLE_VARIATIONS = [
+    # Multi-word style/weight descriptors (often with Oblique)
+    "Black Oblique", "Bold Oblique", "DemiBold Oblique", "ExtraBlack Oblique",
+    "ExtraBold Oblique", "ExtraLight Oblique", "Light Oblique", "Medium Oblique",
+    "Regular Oblique", "Thin Oblique",
+
+    # Multi-word style/weight descriptors (ensure space handling if they appear like this)
+    "Extra Black", "Extra Bold", "Extra Light",
+    "Demi Bold", "Semi Bold",
+
+    # Single, more specific style/weight descriptors
+    "ExtraBlack", "ExtraBold", "ExtraLight", "DemiBold", "SemiBold",
+    "Retina",  # e.g., Fira Code Retina
+    "XLight",  # e.g., Operator Mono XLight
+
+    # Common single-word style/weight descriptors
+    "Black", "Bold", "Book", "Light", "Medium", "Oblique", "Regular", "Text", "Thin",
+
+    # Common abbreviations for styles/weights
+    "ExtLt",   # e.g., IBM Plex Sans ExtLt -> IBM Plex Sans
+    "Medm",    # e.g., IBM Plex Sans Medm -> IBM Plex Sans
+    "SmBld",   # e.g., IBM Plex Sans SmBld -> IBM Plex Sans
+
+    # Specific sub-family indicators that you want to strip to get a broader family name
+    "NL"       # e.g., JetBrains Mono NL -> JetBrains Mono
+
+    # IMPORTANT: Words like "Mono", "Sans", "Serif", "Code", "Pro", "Trial" are often
+    # PART OF THE MAIN FONT FAMILY NAME (NameID 1).
+    # Your script correctly extracts NameID 1. So, "Fira Code" is a family, "Annotation Mono" is a family.
+    # Including "Code" or "Mono" in this `variations` list would incorrectly shorten these names
+    # (e.g., "Fira Code" would become "Fira").
+    # Only include terms here if they represent styles/weights or sub-family distinctions
+    # that you want to remove from the already extracted family name (NameID 1).
+]
+
+# Optional extra suffixes, one per line ('#' starts a comment), next to the script
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'font-scanner-rules.txt')
+
+def load_style_rules(rules_path):
+    """Return the suffixes listed in a rules file."""
+    with open(rules_path, encoding='utf-8') as f:
+        return [line.split('#', 1)[0].strip() for line in f if line.split('#', 1)[0].strip()]
+
+def compile_style_pattern(variations):
+    # Order from longest/most specific to shortest/most general so the alternation
+    # prefers "Bold Oblique" over "Bold" at the same position.
+    alternation = '|'.join(re.escape(v) for v in sorted(set(variations), key=len, reverse=True))
+    # Match a whole run of adjacent variations together with the whitespace around it,
+    # so "Inter Light Bold 3" collapses to "Inter 3" in a single pass over the name.
+    variation = rf"\b(?:{alternation})\b"
+    return re.compile(rf"\s*{variation}(?:\s*{variation})*\s*", re.IGNORECASE)
+
+def set_style_rules(extra_variations=()):
+    """Rebuild the suffix pattern with additional user variations."""
+    global STYLE_PATTERN
+    STYLE_PATTERN = compile_style_pattern(STYLE_VARIATIONS + list(extra_variations))
+    clean_font_name.cache_clear()
+
+STYLE_PATTERN = compile_style_pattern(STYLE_VARIATIONS)
+
+@lru_cache(maxsize=4096)
 def clean_font_name(font_name):
-    # Remove common variation suffixes (e.g., "Light", "Bold", "Medium", etc.)
-    # Order from longest/most specific to shortest/most general for greedy removal.
-    variations = sorted([
-        # Multi-word style/weight descriptors (often with Oblique)
-        "Black Oblique", "Bold Oblique", "DemiBold Oblique", "ExtraBlack Oblique",
-        "ExtraBold Oblique", "ExtraLight Oblique", "Light Oblique", "Medium Oblique",
-        "Regular Oblique", "Thin Oblique",
-
-        # Multi-word style/weight descriptors (ensure space handling if they appear like this)
-        "Extra Black", "Extra Bold", "Extra Light",
-        "Demi Bold", "Semi Bold",
-
-        # Single, more specific style/weight descriptors
-        "ExtraBlack", "ExtraBold", "ExtraLight", "DemiBold", "SemiBold",
-        "Retina",  # e.g., Fira Code Retina
-        "XLight",  # e.g., Operator Mono XLight
-
-        # Common single-word style/weight descriptors
-        "Black", "Bold", "Book", "Light", "Medium", "Oblique", "Regular", "Text", "Thin",
-
-        # Common abbreviations for styles/weights
-        "ExtLt",   # e.g., IBM Plex Sans ExtLt -> IBM Plex Sans
-        "Medm",    # e.g., IBM Plex Sans Medm -> IBM Plex Sans
-        "SmBld",   # e.g., IBM Plex Sans SmBld -> IBM Plex Sans
-
-        # Specific sub-family indicators that you want to strip to get a broader family name
-        "NL"       # e.g., JetBrains Mono NL -> JetBrains Mono
-
-        # IMPORTANT: Words like "Mono", "Sans", "Serif", "Code", "Pro", "Trial" are often
-        # PART OF THE MAIN FONT FAMILY NAME (NameID 1).
-        # Your script correctly extracts NameID 1. So, "Fira Code" is a family, "Annotation Mono" is a family.
-        # Including "Code" or "Mono" in this `variations` list would incorrectly shorten these names
-        # (e.g., "Fira Code" would become "Fira").
-        # Only include terms here if they represent styles/weights or sub-family distinctions
-        # that you want to remove from the already extracted family name (NameID 1).
-    ], key=len, reverse=True) # Sort by length, longest first
-
-    original_font_name = font_name # For comparison if no changes made
-    for variation in variations:
-        # The regex \s*{variation}\s* will match the variation word(s)
-        # surrounded by zero or more whitespace characters on either side.
-        # This handles cases like "FontName Variation", "FontNameVariation", "FontName   Variation  "
-        # and removes the variation and surrounding/adjacent spaces.
-        font_name = re.sub(rf"\s*\b{re.escape(variation)}\b\s*", " ", font_name, flags=re.IGNORECASE).strip()
-        # Using \b for word boundaries makes it safer. Replacing with a single space, then stripping.
+    # Replace every variation with a single space, then strip.
+    cleaned = STYLE_PATTERN.sub(" ", font_name).strip()
 
     # If stripping variations results in an empty string (e.g. font name was just "Bold")
-    # it's better to return the original name or handle as an error.
-    # For now, if it becomes empty, it means all parts were considered variations.
-    # This scenario is unlikely if NameID 1 is correctly fetched.
-    if not font_name:
-        return original_font_name # Fallback if stripping removes everything
+    # it's better to return the original name.
+    if not cleaned:
+        return font_name
 
-    return font_name.strip()
+    return cleaned
 
-def get_main_font_names(folder_path):
-    main_font_names = set()  # Use a set to avoid duplicates
+def legacy_clean_font_name(font_name, variations=STYLE_VARIATIONS):
+    """The original one-re.sub-per-variation loop, kept as the benchmark baseline."""
+    original_font_name = font_name
+    for variation in sorted(variations, key=len, reverse=True):
+        font_name = re.sub(rf"\s*\b{re.escape(variation)}\b\s*", " ", font_name, flags=re.IGNORECASE).strip()
+    return font_name.strip() or original_font_name
+
+def benchmark_clean_font_name(count=50000, seed=0):
+    """Time the compiled pattern against the legacy loop on a synthetic name corpus."""
+    rng = random.Random(seed)
+    families = ["Fira Code", "IBM Plex Sans", "JetBrains Mono", "Operator Mono", "Inter",
+                "Source Serif Pro", "Annotation Mono", "Roboto Slab", "Noto Sans CJK", "Iosevka Term"]
+    names = [
+        " ".join([rng.choice(families)] + rng.sample(STYLE_VARIATIONS, rng.randint(0, 2)))
+        + f" {rng.randrange(count // 10)}" * rng.randint(0, 1)
+        for _ in range(count)
+    ]
+
+    start = time.perf_counter()
+    expected = [legacy_clean_font_name(name) for name in names]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [clean_font_name.__wrapped__(name) for name in names]
+    compiled_time = time.perf_counter() - start
+
+    clean_font_name.cache_clear()
+    start = time.perf_counter()
+    memoized = [clean_font_name(name) for name in names]
+    memoized_time = time.perf_counter() - start
+
+    # The legacy loop strips "Bold Oblique" before "Extra Bold" is tried and leaves "Extra" behind;
+    # the single pass matches leftmost-longest, so the two only differ on such stacked styles.
+    differences = [(name, a, b) for name, a, b in zip(names, expected, compiled) if a != b]
+    print(f"{count} names, {len(set(names))} unique")
+    print(f"Legacy loop:      {legacy_time:.3f}s")
+    print(f"Compiled pattern: {compiled_time:.3f}s ({legacy_time / compiled_time:.1f}x)")
+    print(f"With LRU memo:    {memoized_time:.3f}s ({legacy_time / memoized_time:.1f}x)")
+    print(f"Differences from legacy: {len(differences)}")
+    for name, a, b in differences[:5]:
+        print(f"  {name!r}: {a!r} -> {b!r}")
+
+def read_sfnt_tables(f, tags, offset=0):
+    """Return {tag: bytes} for the requested tables of the sfnt starting at `offset`."""
+    f.seek(offset)
+    header = f.read(12)
+    if len(header) < 12 or header[:4] not in SFNT_VERSIONS:
+        return {}
+    num_tables = struct.unpack('>H', header[4:6])[0]
+    directory = f.read(16 * num_tables)
+    tables = {}
+    for i in range(num_tables):
+        tag, _, table_offset, length = struct.unpack_from('>4sIII', directory, 16 * i)
+        if tag in tags:
+            f.seek(table_offset)
+            tables[tag] = f.read(length)
+    return tables
+
+def read_name_records(name_table, name_ids=(1,)):
+    """Return {nameID: string} for the Windows Unicode records (platform 3, encoding 1) in raw 'name' table bytes."""
+    _, count, string_offset = struct.unpack_from('>HHH', name_table, 0)
+    names = {}
+    for i in range(count):
+        platform_id, encoding_id, _, name_id, length, offset = struct.unpack_from('>HHHHHH', name_table, 6 + 12 * i)
+        if name_id in name_ids and name_id not in names and platform_id == 3 and encoding_id == 1:
+            start = string_offset + offset
+            names[name_id] = name_table[start:start + length].decode('utf-16-be', errors='replace')
+    return names
+
+def parse_family_name(name_table):
+    """Return the Windows Unicode family name (nameID 1, platform 3, encoding 1) from raw 'name' table bytes."""
+    return read_name_records(name_table).get(1)
 
-    # Supported font file extensions
-    supported_extensions = ('.ttf', '.otf', '.woff', '.woff2')
+def read_collection_tables(f, tags):
+    """Return the requested tables of every face in a .ttc/.otc collection, each read at its own offset."""
+    f.seek(8)
+    num_fonts = struct.unpack('>I', f.read(4))[0]
+    offsets = struct.unpack(f'>{num_fonts}I', f.read(4 * num_fonts))
+    return [read_sfnt_tables(f, tags, offset) for offset in offsets]
 
+def read_woff_tables(f, tags):
+    """Return the requested tables of a WOFF file, inflating only those tables."""
+    f.seek(12)
+    num_tables = struct.unpack('>H', f.read(2))[0]
+    f.seek(44)
+    directory = f.read(20 * num_tables)
+    tables = {}
+    for i in range(num_tables):
+        tag, offset, comp_length, orig_length, _ = struct.unpack_from('>4sIIII', directory, 20 * i)
+        if tag in tags:
+            f.seek(offset)
+            data = f.read(comp_length)
+            tables[tag] = zlib.decompress(data) if comp_length < orig_length else data
+    return tables
+
+def read_uint_base128(f):
+    value = 0
+    for _ in range(5):
+        byte = f.read(1)[0]
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value
+    raise ValueError("Invalid UIntBase128 value in WOFF2 table directory")
+
+def read_255_uint16(f):
+    code = f.read(1)[0]
+    if code == 253:
+        return struct.unpack('>H', f.read(2))[0]
+    if code == 255:
+        return 253 + f.read(1)[0]
+    if code == 254:
+        return 506 + f.read(1)[0]
+    return code
+
+def read_woff2_tables(f, tags):
+    """Return the requested tables of every face in a WOFF2 file.
+
+    All tables share one Brotli stream, so it is decompressed incrementally, keeping only the
+    bytes of the requested tables and stopping as soon as the last of them has been produced.
+    """
+    if brotli is None:
+        raise ImportError("WOFF2 support requires the brotli package")
+    f.seek(4)
+    flavor, _, num_tables, _, _, compressed_size = struct.unpack('>4sIHHII', f.read(20))
+    f.seek(48)
+
+    # Work out where each table lands in the decompressed stream
+    stream_offsets, lengths, table_tags = [], [], []
+    position = 0
+    for _ in range(num_tables):
+        flags = f.read(1)[0]
+        tag = f.read(4) if flags & 0x3F == 0x3F else woff2KnownTags[flags & 0x3F].encode('ascii')
+        length = read_uint_base128(f)
+        transform_version = flags >> 6
+        transformed = transform_version == 0 if tag in (b'glyf', b'loca') else transform_version != 0
+        if transformed:
+            length = read_uint_base128(f)
+        stream_offsets.append(position)
+        lengths.append(length)
+        table_tags.append(tag)
+        position += length
+
+    if flavor == b'ttcf':
+        f.read(4)  # collection version
+        face_indices = []
+        for _ in range(read_255_uint16(f)):
+            face_tables = read_255_uint16(f)
+            f.read(4)  # face flavor
+            face_indices.append([read_255_uint16(f) for _ in range(face_tables)])
+    else:
+        face_indices = [range(num_tables)]
+    face_indices = [[i for i in indices if table_tags[i] in tags] for indices in face_indices]
+
+    wanted = {i for indices in face_indices for i in indices}
+    data = {i: bytearray() for i in wanted}
+    end = max((stream_offsets[i] + lengths[i] for i in wanted), default=0)
+
+    decompressor = brotli.Decompressor()
+    produced = 0
+    remaining = compressed_size
+    while produced < end and remaining > 0:
+        chunk = f.read(min(WOFF2_READ_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        output = decompressor.process(chunk)
+        for i, table in data.items():
+            start = max(stream_offsets[i] - produced, 0)
+            stop = min(stream_offsets[i] + lengths[i] - produced, len(output))
+            if start < stop:
+                table += output[start:stop]
+        produced += len(output)
+
+    return [{table_tags[i]: bytes(data[i]) for i in indices} for indices in face_indices]
+
+def read_font_tables(f, tags):
+    """Return {tag: bytes} of the requested tables for each face in a font file."""
+    signature = f.read(4)
+    if signature in SFNT_VERSIONS:
+        return [read_sfnt_tables(f, tags)]
+    if signature == b'ttcf':
+        return read_collection_tables(f, tags)
+    if signature == b'wOFF':
+        return [read_woff_tables(f, tags)]
+    if signature == b'wOF2':
+        return read_woff2_tables(f, tags)
+    raise ValueError("Not a TrueType/OpenType font, collection or WOFF/WOFF2 file")
+
+def read_family_names(font_path):
+    """Return the family names in a font file, reading only the 'name' table of each face."""
+    with open(font_path, 'rb') as f:
+        faces = read_font_tables(f, {b'name'})
+    family_names = (parse_family_name(face[b'name']) for face in faces if b'name' in face)
+    return list(dict.fromkeys(name for name in family_names if name))
+
+def read_family_names_full_load(font_path):
+    """The fontTools full-load approach, kept as the baseline for the memory benchmark."""
+    if font_path.lower().endswith(('.ttc', '.otc')):
+        fonts = TTCollection(font_path).fonts
+    else:
+        fonts = [TTFont(font_path)]
+    family_names = []
+    for font in fonts:
+        for record in font['name'].names:
+            if record.nameID == 1 and record.platformID == 3 and record.platEncID == 1:
+                family_names.append(record.toUnicode())
+                break
+    return family_names
+
+def peak_memory(function, *args):
+    tracemalloc.start()
+    try:
+        function(*args)
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+def benchmark_memory(folder_path):
+    """Compare the peak memory of the name-table reader against a full fontTools load, per format."""
+    totals = {}
+    for font_path in iter_font_files(folder_path):
+        extension = os.path.splitext(font_path)[1].lower()
+        try:
+            streamed = peak_memory(read_family_names, font_path)
+            full = peak_memory(read_family_names_full_load, font_path)
+        except Exception as e:
+            print(f"Error processing {os.path.basename(font_path)}: {e}")
+            continue
+        count, streamed_max, full_max = totals.get(extension, (0, 0, 0))
+        totals[extension] = (count + 1, max(streamed_max, streamed), max(full_max, full))
+
+    print(f"{'Format':<8} {'Files':>6} {'Name table peak':>16} {'Full load peak':>16}")
+    for extension, (count, streamed_max, full_max) in sorted(totals.items()):
+        print(f"{extension:<8} {count:>6} {streamed_max / 1024:>13.1f} KiB {full_max / 1024:>13.1f} KiB")
+
+def scan_font_file(font_path):
+    """Return (font_path, family names, error) for one file. Runs inside a worker process."""
+    try:
+        return font_path, read_family_names(font_path), None
+    except Exception as e:
+        return font_path, None, str(e)
+
+class FontCache:
+    """SQLite cache of family names per font file, keyed by path, mtime and size."""
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS fonts (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                families TEXT NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def lookup(self, font_path, stat):
+        """Return the cached family names for an unchanged file, or None."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, families FROM fonts WHERE path = ?", (font_path,)
+        ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            # Family names never contain newlines, so they are stored one per line
+            return row[2].split('\n') if row[2] else []
+        return None
+
+    def store(self, font_path, stat, families):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO fonts (path, size, mtime_ns, families) VALUES (?, ?, ?, ?)",
+            (font_path, stat.st_size, stat.st_mtime_ns, '\n'.join(families)),
+        )
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def iter_font_files(folder_path):
     for root, _, files in os.walk(folder_path):
         for file in files:
-            if file.lower().endswith(supported_extensions):
-                try:
-                    font_path = os.path.join(root, file)
-                    font = TTFont(font_path)
-                    name_table = font['name']
-                    
-                    # Extract the main font family name (nameID = 1)
-                    for record in name_table.names:
-                        if record.nameID == 1 and record.platformID == 3 and record.platEncID == 1:
-                            font_name = record.toUnicode()
-                            cleaned_name = clean_font_name(font_name)
-                            main_font_names.add(cleaned_name)
-                            break
-                except Exception as e:
-                    print(f"Error processing {file}: {e}")
+            if file.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(root, file)
+
+def run_chunk(function, items):
+    return [function(item) for item in items]
+
+def run_in_pool(function, items, workers=None, chunksize=16):
+    """Yield function(item) for every item in completion order, spreading the calls across a process pool.
+
+    Items are consumed lazily with at most two chunks per worker in flight, so results
+    start arriving while a long directory walk is still producing paths.
+    """
+    # ProcessPoolExecutor refuses more than 61 workers on Windows
+    workers = workers or min(os.cpu_count() or 1, 61)
+    items = iter(items)
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            chunk = list(itertools.islice(items, chunksize))
+            if not chunk:
+                break
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                done = {future for future in pending if future.done()}
+                pending -= done
+            for future in done:
+                yield from future.result()
+            pending.add(executor.submit(run_chunk, function, chunk))
+        for future in as_completed(pending):
+            yield from future.result()
+
+class BoundedPool:
+    """Process pool that is fed one item at a time and pushes back on the producer.
+
+    Items are sent to the workers in chunks to amortise the inter-process overhead,
+    and at most `max_pending` chunks are in flight; `put` blocks until one finishes.
+    """
+
+    def __init__(self, function, workers=None, chunksize=16, max_pending=None):
+        self.function = function
+        self.chunksize = chunksize
+        self.chunk = []
+        self.pending = set()
+        self.ready = []
+        # ProcessPoolExecutor refuses more than 61 workers on Windows
+        workers = workers or min(os.cpu_count() or 1, 61)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending or 2 * workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.executor.shutdown(cancel_futures=exc_type is not None)
 
+    def put(self, item):
+        self.chunk.append(item)
+        if len(self.chunk) >= self.chunksize:
+            self.submit_chunk()
+
+    def submit_chunk(self):
+        while len(self.pending) >= self.max_pending:
+            self.collect(FIRST_COMPLETED)
+        self.pending.add(self.executor.submit(run_chunk, self.function, self.chunk))
+        self.chunk = []
+
+    def collect(self, return_when, timeout=None):
+        done, self.pending = wait(self.pending, timeout=timeout, return_when=return_when)
+        for future in done:
+            self.ready.extend(future.result())
+
+    def drain(self):
+        """Return every result that has finished so far without blocking."""
+        if self.pending:
+            self.collect(FIRST_COMPLETED, timeout=0)
+        ready, self.ready = self.ready, []
+        return ready
+
+    def finish(self):
+        """Yield the remaining results once the producer has run out of items."""
+        if self.chunk:
+            self.submit_chunk()
+        while self.pending:
+            self.collect(FIRST_COMPLETED)
+            yield from self.drain()
+
+def parse_since(value):
+    """Parse --since as a Unix timestamp or an ISO 8601 date/time."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+class ScanProgress:
+    """Prints scanned-file counts and throughput to stderr at most every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.start = self.last_report = time.perf_counter()
+        self.files = self.cached = self.errors = 0
+
+    def update(self, cached, error):
+        self.files += 1
+        self.cached += cached
+        self.errors += error is not None
+        now = time.perf_counter()
+        if self.enabled and now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.start
+        rate = self.files / elapsed if elapsed else 0
+        label = "Scanned" if final else "Scanning:"
+        print(f"{label} {self.files} files ({self.cached} cached, {self.errors} errors) "
+              f"in {elapsed:.1f}s, {rate:.0f} files/s", file=sys.stderr)
+
+def scan_fonts(folder_paths, workers=None, cache_path=DEFAULT_CACHE_PATH, since=None):
+    """Yield (font_path, family names, error, cached) for every font under `folder_paths` as results arrive.
+
+    Files modified before `since` (a Unix timestamp) are skipped.
+    """
+    if isinstance(folder_paths, str):
+        folder_paths = [folder_paths]
+    cache = FontCache(cache_path) if cache_path else None
+    stats = {}
+    seen = set()
+
+    def store(results):
+        for font_path, families, error in results:
+            stat = stats.pop(font_path)
+            if error is None and cache:
+                cache.store(font_path, stat, families)
+            yield font_path, families, error, False
+
+    try:
+        with BoundedPool(scan_font_file, workers) as pool:
+            for folder_path in folder_paths:
+                for font_path in iter_font_files(folder_path):
+                    if font_path in seen:
+                        continue  # Overlapping roots reach some files twice
+                    seen.add(font_path)
+                    try:
+                        stat = os.stat(font_path)
+                    except OSError as e:
+                        yield font_path, None, str(e), False
+                        continue
+                    if since is not None and stat.st_mtime < since:
+                        continue
+                    # Serve unchanged files from the cache right away and hand the rest to the workers
+                    families = cache.lookup(font_path, stat) if cache else None
+                    if families is None:
+                        stats[font_path] = stat
+                        pool.put(font_path)
+                    else:
+                        yield font_path, families, None, True
+                    yield from store(pool.drain())
+            yield from store(pool.finish())
+    finally:
+        if cache:
+            cache.close()
+
+def get_main_font_names(folder_paths, workers=None, cache_path=DEFAULT_CACHE_PATH, since=None, progress=None):
+    main_font_names = set()  # Use a set to avoid duplicates
+    for font_path, families, error, cached in scan_fonts(folder_paths, workers, cache_path, since):
+        if progress:
+            progress.update(cached, error)
+        if error is not None:
+            print(f"Error processing {os.path.basename(font_path)}: {error}")
+            continue
+        main_font_names.update(clean_font_name(name) for name in families)
     return sorted(main_font_names)  # Sort the names alphabetically
 
+def stream_json(folder_paths, workers=None, cache_path=DEFAULT_CACHE_PATH, since=None, progress=None):
+    """Print one JSON object per font file as it is scanned, then a summary object with the cleaned names."""
+    main_font_names = set()
+    for font_path, families, error, cached in scan_fonts(folder_paths, workers, cache_path, since):
+        if progress:
+            progress.update(cached, error)
+        record = {'path': font_path, 'error': error} if error is not None else {
+            'path': font_path,
+            'families': families,
+            'cleaned': sorted({clean_font_name(name) for name in families}),
+        }
+        main_font_names.update(record.get('cleaned', ()))
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+    print(json.dumps({'main_font_names': sorted(main_font_names)}, ensure_ascii=False))
+
+def describe_face(tables):
+    """Return the catalog fields of one face from its raw tables."""
+    names = read_name_records(tables[b'name'], (1, 2, 16)) if b'name' in tables else {}
+    face = {
+        'family': names.get(1),
+        'subfamily': names.get(2),
+        'typographic_family': names.get(16),
+        'weight_class': None,
+        'width_class': None,
+        'italic': False,
+        'glyph_count': None,
+        'variable': b'fvar' in tables,
+        'weight_min': None,
+        'weight_max': None,
+    }
+    os2 = tables.get(b'OS/2')
+    if os2 and len(os2) >= 64:
+        face['weight_class'], face['width_class'] = struct.unpack_from('>HH', os2, 4)
+        face['italic'] = bool(struct.unpack_from('>H', os2, 62)[0] & 0x01)
+    elif len(tables.get(b'head', b'')) >= 46:
+        face['italic'] = bool(struct.unpack_from('>H', tables[b'head'], 44)[0] & 0x02)
+    if len(tables.get(b'maxp', b'')) >= 6:
+        face['glyph_count'] = struct.unpack_from('>H', tables[b'maxp'], 4)[0]
+
+    # Static faces cover a single weight; variable ones span their 'wght' axis
+    face['weight_min'] = face['weight_max'] = face['weight_class']
+    if face['variable']:
+        fvar = tables[b'fvar']
+        axes_offset, _, axis_count, axis_size = struct.unpack_from('>HHHH', fvar, 4)
+        for i in range(axis_count):
+            tag, minimum, _, maximum = struct.unpack_from('>4siii', fvar, axes_offset + i * axis_size)
+            if tag == b'wght':
+                face['weight_min'], face['weight_max'] = round(minimum / 65536), round(maximum / 65536)
+    return face
+
+def hash_file(font_path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(font_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def catalog_font_file(font_path):
+    """Return (font_path, file hash, faces, error) for one file. Runs inside a worker process."""
+    try:
+        with open(font_path, 'rb') as f:
+            faces = [describe_face(tables) for tables in read_font_tables(f, CATALOG_TABLES)]
+        return font_path, hash_file(font_path), faces, None
+    except Exception as e:
+        return font_path, None, None, str(e)
+
+class FontCatalog:
+    """SQLite index of every face in the scanned fonts, updated incrementally by path, mtime and size."""
+
+    def __init__(self, catalog_path=DEFAULT_CATALOG_PATH):
+        os.makedirs(os.path.dirname(catalog_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(catalog_path)
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS faces (
+                path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+                face_index INTEGER NOT NULL,
+                {', '.join(f'{column} {column_type}' for column, column_type in FACE_COLUMNS.items())},
+                PRIMARY KEY (path, face_index)
+            );
+            CREATE INDEX IF NOT EXISTS faces_family ON faces (family);
+            CREATE INDEX IF NOT EXISTS faces_weight ON faces (variable, weight_max);
+        """)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.commit()
+
+    def is_current(self, font_path, stat):
+        row = self.connection.execute(
+            "SELECT size, mtime_ns FROM files WHERE path = ?", (font_path,)
+        ).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns
+
+    def replace(self, font_path, stat, file_hash, faces):
+        self.connection.execute("DELETE FROM files WHERE path = ?", (font_path,))
+        self.connection.execute(
+            "INSERT INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+            (font_path, stat.st_size, stat.st_mtime_ns, file_hash),
+        )
+        self.connection.executemany(
+            f"INSERT INTO faces (path, face_index, {', '.join(FACE_COLUMNS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(FACE_COLUMNS))})",
+            [(font_path, index, *(face[column] for column in FACE_COLUMNS)) for index, face in enumerate(faces)],
+        )
+
+    def prune(self, folder_path, seen_paths):
+        """Drop files under `folder_path` that were not seen by the latest scan. Returns the number removed."""
+        prefix = os.path.join(folder_path, '')
+        stale = [
+            (path,) for (path,) in self.connection.execute("SELECT path FROM files")
+            if path.startswith(prefix) and path not in seen_paths
+        ]
+        self.connection.executemany("DELETE FROM files WHERE path = ?", stale)
+        return len(stale)
+
+    def query(self, where="1"):
+        """Return faces matching an SQL condition over the faces table, e.g. 'variable AND weight_max >= 700'."""
+        cursor = self.connection.execute(
+            f"SELECT faces.*, files.size, files.hash FROM faces JOIN files USING (path) "
+            f"WHERE {where} ORDER BY family, path, face_index"
+        )
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def export_jsonl(self, output_path):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for face in self.query():
+                f.write(json.dumps(face, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def update_catalog(folder_path, catalog, workers=None):
+    """Re-index new and changed fonts under `folder_path` and drop deleted ones. Returns (indexed, unchanged, removed)."""
+    stats = {}
+    seen_paths = set()
+    for font_path in iter_font_files(folder_path):
+        try:
+            stat = os.stat(font_path)
+        except OSError as e:
+            print(f"Error processing {os.path.basename(font_path)}: {e}")
+            continue
+        seen_paths.add(font_path)
+        if not catalog.is_current(font_path, stat):
+            stats[font_path] = stat
+
+    indexed = 0
+    for font_path, file_hash, faces, error in run_in_pool(catalog_font_file, stats, workers=workers):
+        if error is not None:
+            print(f"Error processing {os.path.basename(font_path)}: {error}")
+            continue
+        catalog.replace(font_path, stats[font_path], file_hash, faces)
+        indexed += 1
+    removed = catalog.prune(folder_path, seen_paths)
+    catalog.connection.commit()
+    return indexed, len(seen_paths) - len(stats), removed
+
+def hash_file_prefix(font_path, prefix_bytes=HASH_PREFIX_BYTES):
+    with open(font_path, 'rb') as f:
+        return hashlib.blake2b(f.read(prefix_bytes), digest_size=20).hexdigest()
+
+def name_fingerprints(font_path):
+    """Return (face index, digest of its identifying name records) for every face that has any.
+
+    The face index is None for single-face files, so a face can be matched across containers.
+    """
+    with open(font_path, 'rb') as f:
+        faces = read_font_tables(f, {b'name'})
+    fingerprints = []
+    for face_index, face in enumerate(faces):
+        names = read_name_records(face[b'name'], FINGERPRINT_NAME_IDS) if b'name' in face else {}
+        if names:
+            digest = hashlib.blake2b(json.dumps(sorted(names.items())).encode('utf-8'), digest_size=20)
+            fingerprints.append((face_index if len(faces) > 1 else None, digest.hexdigest()))
+    return fingerprints
+
+# File keys computed by the duplicate finder, from cheapest to most expensive
+FILE_KEYS = {
+    'prefix': hash_file_prefix,
+    'hash': hash_file,
+    'names': name_fingerprints,
+}
+
+# Installable sfnt files are kept over their web-only WOFF/WOFF2 copies
+CONTAINER_RANKS = {'.woff': 1, '.woff2': 2}
+
+def keeper_order(entry):
+    """Sort key that puts the copy worth keeping first; `entry` is a path or a (path, face index) pair."""
+    path = entry if isinstance(entry, str) else entry[0]
+    face_index = None if isinstance(entry, str) else entry[1]
+    return CONTAINER_RANKS.get(os.path.splitext(path)[1].lower(), 0), path, face_index or 0
+
+def compute_file_key(task):
+    """Return (font_path, key, error) for a (key name, font_path) task. Runs inside a worker process."""
+    key_name, font_path = task
+    try:
+        return font_path, FILE_KEYS[key_name](font_path), None
+    except Exception as e:
+        return font_path, None, str(e)
+
+def group_by_key(key_name, paths, workers=None):
+    """Split `paths` by a file key, keeping only groups with more than one member.
+
+    Name fingerprints are per face, so their groups hold (path, face index) pairs instead of paths.
+    """
+    groups = defaultdict(list)
+    tasks = ((key_name, path) for path in paths)
+    for font_path, key, error in run_in_pool(compute_file_key, tasks, workers=workers):
+        if error is not None:
+            print(f"Error processing {os.path.basename(font_path)}: {error}")
+        elif key_name == 'names':
+            for face_index, digest in key:
+                groups[digest].append((font_path, face_index))
+        elif key is not None:
+            groups[key].append(font_path)
+    return [sorted(group, key=keeper_order) for group in groups.values() if len(group) > 1]
+
+def find_duplicate_fonts(folder_paths, workers=None):
+    """Return (identical file groups, same-face groups, sizes) for the fonts under `folder_paths`.
+
+    Only files whose sizes collide are hashed, first by a prefix and then in full where the
+    prefixes also match, so most files are never read. Name-table fingerprints of each face then
+    catch the same face saved in another container or copied into a collection. Every group
+    starts with the copy to keep.
+    """
+    sizes = {}
+    for folder_path in folder_paths:
+        for font_path in iter_font_files(folder_path):
+            try:
+                sizes[os.path.abspath(font_path)] = os.path.getsize(font_path)
+            except OSError as e:
+                print(f"Error processing {os.path.basename(font_path)}: {e}")
+
+    by_size = defaultdict(list)
+    for font_path, size in sizes.items():
+        by_size[size].append(font_path)
+
+    identical = []
+    colliding = [path for group in by_size.values() if len(group) > 1 for path in group]
+    for group in group_by_key('prefix', colliding, workers):
+        if sizes[group[0]] <= HASH_PREFIX_BYTES:
+            identical.append(group)  # The prefix already covers the whole file
+        else:
+            identical.extend(group_by_key('hash', group, workers))
+
+    # Fingerprint the kept file of each identical group plus every other file
+    redundant = {path for group in identical for path in group[1:]}
+    same_faces = group_by_key('names', [path for path in sizes if path not in redundant], workers)
+
+    return sorted(identical), sorted(same_faces, key=lambda group: keeper_order(group[0])), sizes
+
+def print_duplicate_report(identical, same_faces, sizes):
+    def describe(entry):
+        """Return (label, bytes freed by deleting it) for a path or a (path, face index) pair."""
+        if isinstance(entry, str):
+            return entry, sizes[entry]
+        path, face_index = entry
+        if face_index is None:
+            return path, sizes[path]
+        return f"{path}#{face_index}", 0  # A face inside a collection only goes away with the rest of it
+
+    for title, groups in (("Identical files", identical), ("Same faces in different files", same_faces)):
+        wasted = sum(describe(entry)[1] for group in groups for entry in group[1:])
+        print(f"\n{title}: {len(groups)} groups, {sum(len(g) - 1 for g in groups)} redundant copies, "
+              f"{wasted / (1024 * 1024):.1f} MiB wasted")
+        for group in groups:
+            print(f"  keep {describe(group[0])[0]}")
+            for entry in group[1:]:
+                label, size = describe(entry)
+                print(f"    redundant {label} ({f'{size / 1024:.0f} KiB' if size else 'face in a collection'})")
+
+def print_faces(faces):
+    for face in faces:
+        weight = face['weight_class'] if not face['variable'] else f"{face['weight_min']}-{face['weight_max']} (variable)"
+        style = " italic" if face['italic'] else ""
+        print(f"{face['family']} / {face['subfamily']}  weight {weight}{style}, "
+              f"{face['glyph_count']} glyphs  {face['path']}#{face['face_index']}")
+
 def main():
-    
-    if sys.argv.__len__() > 1:
-        folder_path = sys.argv[1]
-    else:
-        folder_path = os.getcwd()
-    
-    if not os.path.isdir(folder_path):
-        print("Invalid folder path.")
+    parser = argparse.ArgumentParser(description="List the main family names of the fonts in one or more folders.")
+    parser.add_argument("folder_paths", nargs="*", default=[os.getcwd()], help="Folders to scan (default: current directory)")
+    parser.add_argument("--json", action="store_true", help="Stream one JSON object per font to stdout, then the cleaned names (no prompts)")
+    parser.add_argument("--batch", action="store_true", help="Print the cleaned names without clearing the screen or prompting")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--since", type=parse_since, help="Only scan files modified since this Unix timestamp or ISO date")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor update the family name cache")
+    parser.add_argument("--rules", help=f"File of extra style suffixes to strip, one per line (default: {DEFAULT_RULES_PATH} if it exists)")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark clean_font_name against the legacy loop and exit")
+    parser.add_argument("--memory", action="store_true", help="Compare peak memory of name-table reads against full font loads and exit")
+    parser.add_argument("--catalog", nargs="?", const=DEFAULT_CATALOG_PATH, help=f"Update a per-face SQLite catalog of the folders (default: {DEFAULT_CATALOG_PATH})")
+    parser.add_argument("--query", help="Print catalog faces matching an SQL condition, e.g. \"variable AND weight_max >= 700\"")
+    parser.add_argument("--duplicates", action="store_true", help="Report redundant font files and the space they waste")
+    parser.add_argument("--export-jsonl", help="Write every catalog face to this JSON Lines file")
+    args = parser.parse_args()
+
+    rules_path = args.rules or (DEFAULT_RULES_PATH if os.path.isfile(DEFAULT_RULES_PATH) else None)
+    if rules_path:
+        set_style_rules(load_style_rules(rules_path))
+
+    if args.benchmark:
+        benchmark_clean_font_name()
+        return
+
+    if args.query or args.export_jsonl:
+        catalog = FontCatalog(args.catalog or DEFAULT_CATALOG_PATH)
+        try:
+            if args.query:
+                print_faces(catalog.query(args.query))
+            if args.export_jsonl:
+                catalog.export_jsonl(args.export_jsonl)
+                print(f"Catalog exported to {args.export_jsonl}")
+        finally:
+            catalog.close()
+        return
+
+    folder_paths = args.folder_paths
+    for folder_path in folder_paths:
+        if not os.path.isdir(folder_path):
+            print(f"Invalid folder path: {folder_path}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.memory:
+        for folder_path in folder_paths:
+            benchmark_memory(folder_path)
+        return
+
+    if args.duplicates:
+        print_duplicate_report(*find_duplicate_fonts(folder_paths, workers=args.workers))
+        return
+
+    if args.catalog:
+        catalog = FontCatalog(args.catalog)
+        try:
+            for folder_path in folder_paths:
+                indexed, unchanged, removed = update_catalog(os.path.abspath(folder_path), catalog, workers=args.workers)
+                print(f"Catalog {args.catalog}: {folder_path}: {indexed} indexed, {unchanged} unchanged, {removed} removed")
+        finally:
+            catalog.close()
+        return
+
+    cache_path = None if args.no_cache else DEFAULT_CACHE_PATH
+    progress = ScanProgress()
+    if args.json:
+        stream_json(folder_paths, args.workers, cache_path, args.since, progress)
+        progress.report(final=True)
         return
 
-    main_font_names = get_main_font_names(folder_path)
+    # Headless runs (--batch, or no terminal to answer the prompt) must never block on input()
+    interactive = not args.batch and sys.stdin.isatty()
+    if interactive and os.name == 'nt':
+        os.system('cls')
+
+    main_font_names = get_main_font_names(folder_paths, args.workers, cache_path, args.since, progress)
+    progress.report(final=True)
     result = ", ".join(main_font_names)
 
+    if not interactive:
+        print(result)
+        return
+
     print("\nMain Font Family Names (cleaned):")
     print(result)
 
@@ -109,5 +970,4 @@ def main():
         print("Result copied to clipboard!")
 
 if __name__ == "__main__":
-  os.system('cls')
-  main()
\ No newline at end of file
+    main()
@@ -1,83 +1,604 @@
+import argparse
+import codecs
+import csv
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import os
+import re
 import sys
+import tempfile
+import time
 import tldextract
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
 import pyperclip
 import tkinter as tk
 from tkinter import filedialog
 
-def group_urls_from_file(input_filename):
-    """Reads a OneTab export file, groups URLs by domain, and returns the formatted text."""
-    
-    # --- Robust file reading with multiple encodings ---
-    encodings_to_try = ['utf-8', 'cp1252', 'latin-1']
-    correct_encoding = None
-
-    for encoding in encodings_to_try:
-        try:
-            # Try to open and read the file to test the encoding
-            with open(input_filename, 'r', encoding=encoding) as f:
-                f.read() # Read the whole file to ensure there are no hidden errors
-            correct_encoding = encoding
-            print(f"✅ File successfully read using '{correct_encoding}' encoding.")
-            break # Found a working encoding, so we can stop looping
-        except UnicodeDecodeError:
-            # This encoding failed, so the loop will continue to the next one
-            continue
-        except FileNotFoundError:
-            print(f"❌ ERROR: The file '{input_filename}' was not found.")
-            sys.exit(1)
-        except Exception as e:
-            print(f"❌ An unexpected error occurred: {e}")
-            sys.exit(1)
-
-    if not correct_encoding:
-        print(f"❌ ERROR: Could not decode the file using any of the tried encodings: {encodings_to_try}")
-        print("The file may be corrupted or in an unsupported format.")
-        sys.exit(1)
-        
-    # --- Now process the file using the determined correct encoding ---
-    grouped_urls = defaultdict(list)
+# Bytes inspected to guess the encoding before the file is streamed
+SNIFF_BYTES = 64 * 1024
+
+# Checked in order: the UTF-32 BOMs start with the UTF-16 ones
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Bytes that cp1252 leaves undefined; a prefix containing them is treated as latin-1
+CP1252_UNDEFINED = {0x81, 0x8D, 0x8F, 0x90, 0x9D}
+
+def decode_as_cp1252(error):
+    """Codec error handler: decode stray bytes as cp1252, or as latin-1 where cp1252 has no character."""
+    bad = error.object[error.start:error.end]
+    return "".join(chr(b) if b in CP1252_UNDEFINED else bytes([b]).decode('cp1252') for b in bad), error.end
+
+codecs.register_error('cp1252-fallback', decode_as_cp1252)
+
+def detect_encoding(prefix):
+    """Guess the encoding of a file from its first bytes: BOM, then UTF-8 validity, then cp1252/latin-1."""
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
     try:
-        with open(input_filename, 'r', encoding=correct_encoding) as f:
+        # final=False tolerates a multi-byte character cut off at the end of the prefix
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    if CP1252_UNDEFINED.intersection(prefix):
+        return 'latin-1'
+    return 'cp1252'
+
+def iter_export_lines(input_filename, verbose=True):
+    """Yield the non-empty lines of an export, decoding it incrementally in a single pass."""
+    with open(input_filename, 'rb') as raw:
+        encoding = detect_encoding(raw.read(SNIFF_BYTES))
+        raw.seek(0)
+        if verbose:
+            print(f"✅ Reading file as '{encoding}' (detected from the first {SNIFF_BYTES // 1024} KiB).")
+        # The guess only covers the prefix: a UTF-8 file can still hold a stray legacy byte later on, and
+        # a cp1252 one a byte cp1252 leaves undefined. Decode those as cp1252/latin-1 instead of failing.
+        if encoding.startswith('utf-8') or encoding == 'cp1252':
+            errors = 'cp1252-fallback'
+        else:
+            errors = 'replace'  # latin-1 never fails; BOM-marked UTF-16/32 with broken bytes shouldn't abort the run
+        with io.TextIOWrapper(raw, encoding=encoding, errors=errors) as f:
             for line in f:
                 line = line.strip()
-                if not line:
-                    continue
-                
-                url_part = line.split(' | ')[0]
-                extracted = tldextract.extract(url_part)
-                domain = extracted.registered_domain
-                
-                if not domain:
-                    domain = "other_or_local"
-
-                grouped_urls[domain].append(line)
+                if line:
+                    yield line
+
+# Public Suffix List snapshot shipped inside the tldextract package, so lookups never touch the network
+SUFFIX_LIST_SNAPSHOT = os.path.join(os.path.dirname(tldextract.__file__), '.tld_set_snapshot')
+
+# Distinct hosts remembered by registered_domain; exports share a few hundred hosts across many tabs
+DOMAIN_CACHE_SIZE = 65536
+
+# Approximate bytes of line text kept in memory before buckets are spilled to run files
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Rough per-line bookkeeping cost (list slot, str header) counted against the budget
+RECORD_OVERHEAD = 64
+
+# Maximum number of run files merged (and held open) at once
+MERGE_FAN_IN = 64
+
+# Raw URLs remembered by normalize_url; duplicate tabs usually repeat the exact same URL
+URL_CACHE_SIZE = 65536
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track where a click came from; dropped when collapsing duplicate tabs
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid', 'igshid',
+    'mc_cid', 'mc_eid', 'mkt_tok', '_hsenc', '_hsmi', 'ref_src', 'ref_url', 'spm', 'si',
+}
+TRACKING_PARAM_PREFIXES = ('utm_', 'pk_', 'vero_')
+
+IPV4_PATTERN = re.compile(r"\d{1,3}(?:\.\d{1,3}){3}")
+
+class SuffixTrie:
+    """Public suffix rules stored as a trie of labels, read right to left."""
+
+    def __init__(self, rules):
+        self.root = {}
+        for rule in rules:
+            exception = rule.startswith('!')
+            node = self.root
+            for label in reversed(rule.lstrip('!').split('.')):
+                node = node.setdefault(label, {})
+            # '!' marks an exception rule, True a normal or wildcard rule
+            node['$'] = '!' if exception else True
+
+    @classmethod
+    def from_file(cls, path):
+        """Load the ICANN section of a public_suffix_list.dat file (private domains are ignored, as in tldextract)."""
+        rules = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('// ===BEGIN PRIVATE DOMAINS==='):
+                    break
+                if line and not line.startswith('//'):
+                    rules.append(line.lower())
+        return cls(rules)
+
+    def suffix_length(self, labels):
+        """Return how many trailing labels form the public suffix (0 if none matches)."""
+        node = self.root
+        length = 0
+        for depth, label in enumerate(reversed(labels), 1):
+            if label in node:
+                node = node[label]
+            elif '*' in node:
+                node = node['*']
+            else:
+                break
+            marker = node.get('$')
+            if marker == '!':
+                return depth - 1
+            if marker:
+                length = depth
+        return length
+
+def extract_host(url):
+    """Return the lower-cased host of a URL (scheme optional), without credentials or port."""
+    start = url.find('://')
+    start = start + 3 if start != -1 else 0
+    end = len(url)
+    for separator in '/?#':
+        position = url.find(separator, start)
+        if position != -1 and position < end:
+            end = position
+    host = url[start:end].rpartition('@')[2]
+    if not host.startswith('['):  # IPv6 literals keep their colons
+        host = host.partition(':')[0]
+    return host.rstrip('.').lower()
+
+def load_domain_resolver(suffix_list_path=SUFFIX_LIST_SNAPSHOT):
+    """Return a memoized host -> registered domain function that works fully offline."""
+    try:
+        trie = SuffixTrie.from_file(suffix_list_path)
+    except OSError:
+        # No snapshot on disk; tldextract can still run offline from its bundled copy
+        extractor = tldextract.TLDExtract(suffix_list_urls=())
+        return lru_cache(maxsize=DOMAIN_CACHE_SIZE)(lambda host: extractor(host).registered_domain)
+
+    @lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+    def registered_domain(host):
+        if not host or host.startswith('[') or IPV4_PATTERN.fullmatch(host):
+            return ""
+        labels = host.split('.')
+        # The list stores internationalised suffixes in Unicode; hosts usually arrive as punycode
+        lookup_labels = labels
+        if 'xn--' in host:
+            try:
+                lookup_labels = [label.encode('ascii').decode('idna') if label.startswith('xn--') else label for label in labels]
+            except UnicodeError:
+                pass
+        suffix_length = trie.suffix_length(lookup_labels)
+        if suffix_length == 0 or suffix_length >= len(labels):
+            return ""
+        return ".".join(labels[-suffix_length - 1:])
+
+    return registered_domain
+
+def iter_domain_lines(input_filename, registered_domain, verbose=True):
+    """Yield (domain, line) for every non-empty line of an export."""
+    for line in iter_export_lines(input_filename, verbose):
+        url_part = line.split(' | ')[0]
+        domain = registered_domain(extract_host(url_part))
+
+        if not domain:
+            domain = "other_or_local"
+
+        yield domain, line
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def normalize_url(url):
+    """Return a canonical form of an http(s) URL for duplicate detection; other URLs are returned unchanged.
+
+    http and https are treated alike, the host is lower-cased, default ports, tracking
+    parameters and plain fragments are dropped, and trailing slashes are removed from the path.
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname  # Already lower-cased by urlsplit
+    if ':' in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition('@')[0]
+    netloc = f"{userinfo}@{host}" if userinfo else host
+
+    path = parts.path.rstrip('/') or '/'
+    query = '&'.join(
+        param for param in parts.query.split('&')
+        if param and not is_tracking_param(param.partition('=')[0])
+    )
+    # Routes (#/inbox, #!/page, #inbox/123) address different pages of single-page apps; plain anchors don't
+    fragment = parts.fragment if '/' in parts.fragment or parts.fragment.startswith('!') else ''
+    return urlunsplit(('https', netloc, path, query, fragment))
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+class TabDeduplicator:
+    """Collapses tabs whose URLs normalize to the same address, remembering a compact digest per URL.
+
+    The digests (and counts) grow with every unique URL and are not covered by --memory-budget.
+    """
+
+    def __init__(self, keep_counts=False):
+        self.keep_counts = keep_counts
+        self.seen = set()
+        self.counts = defaultdict(int)
+        self.duplicates = 0
+
+    @staticmethod
+    def key(canonical_url):
+        return hashlib.blake2b(canonical_url.encode('utf-8'), digest_size=16).digest()
+
+    @classmethod
+    def line_key(cls, line):
+        """Return the digest of a tab line's canonical URL."""
+        return cls.key(normalize_url(line.partition(' | ')[0]))
+
+    def collapse_with_keys(self, records):
+        """Yield (domain, line, key) for the first tab per canonical URL, keeping the line verbatim.
+
+        The canonical form is only the comparison key: rewriting the URL could break links on
+        http-only hosts or servers where the trailing slash matters.
+        """
+        for domain, line in records:
+            key = self.line_key(line)
+            if self.keep_counts:
+                self.counts[key] += 1
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            yield domain, line, key
+
+    def collapse(self, records):
+        """Yield the first (domain, line) record per canonical URL, keeping the line verbatim."""
+        for domain, line, _ in self.collapse_with_keys(records):
+            yield domain, line
+
+    def annotate(self, records):
+        """Append how many times each tab appeared to the lines of collapsed duplicates."""
+        for domain, line in records:
+            # Kept lines are the originals, so normalizing them again yields the key they were counted under
+            count = self.counts[self.line_key(line)]
+            yield domain, line if count == 1 else f"{line} ({count}×)"
+
+def iter_output_lines(records, counts):
+    """Yield the output lines for (domain, line) records already sorted by domain, then line."""
+    current_domain = None
+    for domain, line in records:
+        if domain != current_domain:
+            header = f"\n{domain} | --- {domain} ({counts[domain]} links) ---\n"
+            yield header if current_domain is not None else header.lstrip()
+            current_domain = domain
+        yield line
+
+def report_throughput(line_count, domain_count, start, deduplicator=None):
+    elapsed = time.perf_counter() - start
+    if deduplicator:
+        line_count += deduplicator.duplicates
+    rate = line_count / elapsed if elapsed else 0
+    print(f"ℹ️ Grouped {line_count} lines into {domain_count} domains in {elapsed:.2f}s ({rate:,.0f} lines/s).")
+    if deduplicator:
+        print(f"ℹ️ Collapsed {deduplicator.duplicates} duplicate tabs.")
+
+def group_urls_from_file(input_filename, registered_domain=None, dedupe=False, show_counts=False):
+    """Reads a OneTab export file, groups URLs by domain, and returns the formatted text."""
+    registered_domain = registered_domain or load_domain_resolver()
+    deduplicator = TabDeduplicator(show_counts) if dedupe else None
+    grouped_urls = defaultdict(list)
+    line_count = 0
+    start = time.perf_counter()
+    try:
+        records = iter_domain_lines(input_filename, registered_domain)
+        if deduplicator:
+            records = deduplicator.collapse(records)
+        for domain, line in records:
+            grouped_urls[domain].append(line)
+            line_count += 1
+    except FileNotFoundError:
+        print(f"❌ ERROR: The file '{input_filename}' was not found.")
+        sys.exit(1)
     except Exception as e:
         print(f"❌ An error occurred during URL processing: {e}")
         sys.exit(1)
 
+    report_throughput(line_count, len(grouped_urls), start, deduplicator)
+
     # --- Format the output string ---
-    output_lines = []
-    for domain in sorted(grouped_urls.keys()):
-        output_lines.append(f"\n{domain} | --- {domain} ({len(grouped_urls[domain])} links) ---\n")
-        for link in sorted(grouped_urls[domain]):
-            output_lines.append(link)
-            
-    if output_lines:
-        output_lines[0] = output_lines[0].lstrip()
-        
-    return "\n".join(output_lines)
+    counts = {domain: len(links) for domain, links in grouped_urls.items()}
+    records = ((domain, link) for domain in sorted(grouped_urls) for link in sorted(grouped_urls[domain]))
+    if deduplicator and show_counts:
+        records = deduplicator.annotate(records)
+    return "\n".join(iter_output_lines(records, counts))
+
+class SpillingGrouper:
+    """Groups (domain, line) records in memory and spills them to sorted run files past a memory budget."""
+
+    def __init__(self, memory_budget, temp_dir):
+        self.memory_budget = memory_budget
+        self.temp_dir = temp_dir
+        self.buckets = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.used = 0
+        self.runs = []
+        self.run_numbers = itertools.count()
+
+    def add(self, domain, line):
+        self.buckets[domain].append(line)
+        self.counts[domain] += 1
+        self.used += len(line) + RECORD_OVERHEAD
+        if self.used >= self.memory_budget:
+            self.spill()
+
+    def sorted_buckets(self):
+        return ((domain, line) for domain in sorted(self.buckets) for line in sorted(self.buckets[domain]))
+
+    def spill(self):
+        self.runs.append(self.write_run(self.sorted_buckets()))
+        self.buckets.clear()
+        self.used = 0
+
+    def write_run(self, records):
+        path = os.path.join(self.temp_dir, f"run-{next(self.run_numbers):06d}.txt")
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for domain, line in records:
+                # Domains never contain tabs, so the first tab separates the fields
+                f.write(f"{domain}\t{line}\n")
+        return path
+
+    @staticmethod
+    def read_run(path):
+        with open(path, encoding='utf-8', newline='\n') as f:
+            for record in f:
+                domain, _, line = record.rstrip('\n').partition('\t')
+                yield domain, line
+
+    def merged(self):
+        """Yield every record sorted by domain, then line, with a k-way heap merge over the runs."""
+        if not self.runs:
+            return self.sorted_buckets()  # Everything fit in memory
+        if self.buckets:
+            self.spill()
+        # Merge in passes so no more than MERGE_FAN_IN run files are open at once
+        while len(self.runs) > MERGE_FAN_IN:
+            batch, self.runs = self.runs[:MERGE_FAN_IN], self.runs[MERGE_FAN_IN:]
+            self.runs.append(self.write_run(heapq.merge(*map(self.read_run, batch))))
+            for path in batch:
+                os.remove(path)
+        return heapq.merge(*map(self.read_run, self.runs))
+
+def group_urls_to_file(input_filename, output_filename, memory_budget=DEFAULT_MEMORY_BUDGET, registered_domain=None,
+                       dedupe=False, show_counts=False):
+    """Groups an export of any size into `output_filename`, keeping roughly `memory_budget` bytes of lines in memory."""
+    registered_domain = registered_domain or load_domain_resolver()
+    # Deduplication keeps a 16-byte digest (plus a count) per unique URL for the whole run; that set is
+    # not spilled and not counted against memory_budget, so --dedupe is not memory-bounded
+    deduplicator = TabDeduplicator(show_counts) if dedupe else None
+    line_count = 0
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(prefix="onetab-runs-") as temp_dir:
+            grouper = SpillingGrouper(memory_budget, temp_dir)
+            records = iter_domain_lines(input_filename, registered_domain)
+            if deduplicator:
+                records = deduplicator.collapse(records)
+            for domain, line in records:
+                grouper.add(domain, line)
+                line_count += 1
+            report_throughput(line_count, len(grouper.counts), start, deduplicator)
+            if grouper.runs:
+                print(f"ℹ️ Merging {len(grouper.runs) + bool(grouper.buckets)} sorted runs into '{output_filename}'...")
+
+            with open(output_filename, 'w', encoding='utf-8') as f:
+                records = grouper.merged()
+                if deduplicator and show_counts:
+                    records = deduplicator.annotate(records)
+                for index, output_line in enumerate(iter_output_lines(records, grouper.counts)):
+                    f.write(output_line if index == 0 else "\n" + output_line)
+    except FileNotFoundError:
+        print(f"❌ ERROR: The file '{input_filename}' was not found.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ An error occurred during URL processing: {e}")
+        sys.exit(1)
+    return line_count
+
+def expand_inputs(inputs):
+    """Return the export files named by `inputs`, replacing each folder with the .txt files directly inside it."""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(sorted(
+                entry.path for entry in os.scandir(path)
+                if entry.is_file() and entry.name.lower().endswith('.txt')
+            ))
+        else:
+            paths.append(path)
+    return paths
+
+_worker_resolver = None
+
+def group_file_worker(task):
+    """Group one export inside a worker process.
+
+    Returns (input_filename, {domain: [(line, count, URL key or None), ...]}, lines read, seconds, error).
+    """
+    global _worker_resolver
+    input_filename, dedupe = task
+    start = time.perf_counter()
+    try:
+        # Each worker builds the suffix trie once and reuses it for every file it is handed
+        if _worker_resolver is None:
+            _worker_resolver = load_domain_resolver()
+        deduplicator = TabDeduplicator(keep_counts=True) if dedupe else None
+        records = iter_domain_lines(input_filename, _worker_resolver, verbose=False)
+        groups = defaultdict(list)
+        if deduplicator:
+            for domain, line, key in deduplicator.collapse_with_keys(records):
+                groups[domain].append((line, key))
+            line_count = len(deduplicator.seen) + deduplicator.duplicates
+            groups = {
+                domain: [(line, deduplicator.counts[key], key) for line, key in lines]
+                for domain, lines in groups.items()
+            }
+        else:
+            for domain, line in records:
+                groups[domain].append((line, 1, None))
+            line_count = sum(len(lines) for lines in groups.values())
+        return input_filename, groups, line_count, time.perf_counter() - start, None
+    except Exception as e:
+        return input_filename, None, 0, time.perf_counter() - start, str(e)
+
+def group_files_in_parallel(input_filenames, workers=None, dedupe=False):
+    """Group several exports across worker processes and merge their groups.
+
+    Returns ({domain: [(line, count), ...]}, per-file results). With `dedupe`, tabs are also
+    collapsed across files and their counts summed.
+    """
+    merged = defaultdict(list)
+    canonical = {}  # URL digest -> [domain, line, count] when deduplicating
+    file_results = []
+    # ProcessPoolExecutor refuses more than 61 workers on Windows, and extra workers would sit idle
+    workers = workers or min(os.cpu_count() or 1, 61, max(len(input_filenames), 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Results are merged in input order so the tab kept for a duplicate never depends on timing
+        tasks = [(path, dedupe) for path in input_filenames]
+        for input_filename, groups, line_count, seconds, error in executor.map(group_file_worker, tasks):
+            file_results.append((input_filename, line_count, seconds, error))
+            if error is not None:
+                print(f"❌ {input_filename}: {error}")
+                continue
+            print(f"✅ {input_filename}: {line_count} lines in {seconds:.2f}s")
+            for domain, lines in groups.items():
+                if not dedupe:
+                    merged[domain].extend((line, count) for line, count, _ in lines)
+                    continue
+                for line, count, key in lines:
+                    if key in canonical:
+                        canonical[key][2] += count
+                    else:
+                        canonical[key] = [domain, line, count]
+    for domain, line, count in canonical.values():
+        merged[domain].append((line, count))
+    return merged, file_results
+
+def write_groups(groups, output_filename, output_format, show_counts=False):
+    """Write merged groups as the usual grouped text, JSON or CSV."""
+    domains = sorted(groups)
+    for domain in domains:
+        groups[domain].sort()
+    if output_format == 'json':
+        document = [
+            {
+                'domain': domain,
+                'links': [
+                    dict(zip(('url', 'title'), line.split(' | ', 1)), **({'count': count} if show_counts else {}))
+                    for line, count in groups[domain]
+                ],
+            }
+            for domain in domains
+        ]
+        with open(output_filename, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+    elif output_format == 'csv':
+        with open(output_filename, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['domain', 'url', 'title', 'count'])
+            for domain in domains:
+                for line, count in groups[domain]:
+                    url, _, title = line.partition(' | ')
+                    writer.writerow([domain, url, title, count])
+    else:
+        counts = {domain: len(groups[domain]) for domain in domains}
+        records = (
+            (domain, line if count == 1 or not show_counts else f"{line} ({count}×)")
+            for domain in domains for line, count in groups[domain]
+        )
+        with open(output_filename, 'w', encoding='utf-8') as f:
+            f.write("\n".join(iter_output_lines(records, counts)))
+
+def run_batch(input_filenames, output_filename, output_format, workers=None, dedupe=False, show_counts=False):
+    """Headless entry point: group many exports in parallel, write the merged result and print a timing summary."""
+    start = time.perf_counter()
+    groups, file_results = group_files_in_parallel(input_filenames, workers, dedupe)
+    grouped = time.perf_counter()
+    write_groups(groups, output_filename, output_format, show_counts)
+    finished = time.perf_counter()
+
+    line_count = sum(result[1] for result in file_results)
+    failures = sum(result[3] is not None for result in file_results)
+    tab_count = sum(len(lines) for lines in groups.values())
+    elapsed = finished - start
+    print(f"\nℹ️ {len(file_results) - failures} of {len(file_results)} files, {line_count} lines -> "
+          f"{tab_count} tabs in {len(groups)} domains.")
+    print(f"ℹ️ Grouping {grouped - start:.2f}s, writing {finished - grouped:.2f}s, total {elapsed:.2f}s "
+          f"({line_count / elapsed if elapsed else 0:,.0f} lines/s).")
+    print(f"✅ File successfully saved to: {output_filename}")
+    return failures == 0
 
 def main():
     """Main function to orchestrate the script's execution."""
-    if len(sys.argv) < 2:
-        print("Usage: python sort_tabs.py <path_to_your_onetab_file.txt>")
-        sys.exit(1)
-        
-    input_file = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Group the tabs of OneTab exports by registered domain.")
+    parser.add_argument("inputs", nargs="+", help="OneTab export (.txt), or several exports and folders of them for batch mode")
+    parser.add_argument("--output", help="Write the grouped tabs straight to this file (no clipboard copy or save dialog); "
+                                         "a single text export spills to temporary run files when memory runs short")
+    parser.add_argument("--format", choices=("text", "json", "csv"),
+                        help="Output format for batch mode (default: from the --output extension, else text)")
+    parser.add_argument("--workers", type=int, help="Worker processes for batch mode (default: one per CPU)")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="MiB of lines to hold in memory before spilling (default: %(default)s)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Normalize URLs (scheme, host case, default ports, trailing slashes, tracking parameters) "
+                             "and keep one tab per page; the seen-URL set is held in memory outside --memory-budget")
+    parser.add_argument("--counts", action="store_true", help="With --dedupe, note how many times each collapsed tab appeared")
+    args = parser.parse_args()
+
+    input_files = expand_inputs(args.inputs)
+    output_format = args.format or {'.json': 'json', '.csv': 'csv'}.get(os.path.splitext(args.output or '')[1].lower(), 'text')
+    if len(input_files) != 1 or output_format != 'text':
+        # Batch mode: several exports merged in parallel, never touching the clipboard or Tk
+        if not args.output:
+            parser.error("--output is required when grouping several exports or writing JSON/CSV")
+        if not input_files:
+            parser.error("no .txt exports found in the given folders")
+        ok = run_batch(input_files, args.output, output_format, args.workers, args.dedupe, args.counts)
+        sys.exit(0 if ok else 1)
+
+    input_file = input_files[0]
     print(f"Processing '{input_file}'...")
 
-    organized_text = group_urls_from_file(input_file)
+    if args.output:
+        group_urls_to_file(input_file, args.output, args.memory_budget * 1024 * 1024, dedupe=args.dedupe, show_counts=args.counts)
+        print(f"✅ File successfully saved to: {args.output}")
+        return
+
+    organized_text = group_urls_from_file(input_file, dedupe=args.dedupe, show_counts=args.counts)
     
     if not organized_text:
         print("No URLs found or processed. Exiting.")
@@ -1,26 +1,745 @@
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import itertools
+import json
 import os
 import re
+import select
+import shutil
+import struct
+import sys
+import threading
+import time
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
-import winreg
+import numpy as np
 from PIL import Image, ImageTk
 
+try:
+    import winreg
+except ImportError:
+    winreg = None  # Not on Windows; only file-based history sources are available
+
+
+THUMBNAIL_SIZE = (180, 120)
+# Fixed gallery geometry so rows can be placed without asking Tk to measure them
+COLUMN_WIDTH = 230
+TILE_SIZE = (214, 200)
+ROW_HEIGHT = TILE_SIZE[1] + 16
+# Decoded thumbnails kept for scrolling back, in multiples of the on-screen tile pool
+THUMBNAIL_MEMORY_POOLS = 4
+# Bits kept per channel when grouping similar colors for the dominant color
+COLOR_QUANTIZATION_BITS = 4
+# Thumbnails colored per vectorized batch by the background color pass
+COLOR_BATCH_SIZE = 64
+DEFAULT_ACCENT_COLOR = "#3498db"
+# TranscodedImageCache blobs start with a fixed-size header followed by the UTF-16LE path
+TRANSCODED_PATH_OFFSET = 24
+# Largest Hamming distance between 64-bit dHashes still treated as the same picture
+DUPLICATE_DISTANCE = 6
+# Seconds between directory scans when the platform has no change notifications
+POLL_INTERVAL = 2.0
+# Trashed wallpapers are purged for good after this many days
+TRASH_RETENTION_DAYS = 30
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tif", ".tiff", ".jfif")
+CACHE_ROOT = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "WallpaperManager",
+)
+
+
+def parse_transcoded_image_cache(blob):
+    """Decode the wallpaper path stored in a TranscodedImageCache registry blob"""
+    start = TRANSCODED_PATH_OFFSET
+    # The path ends at the first NUL code unit, which must start on an even byte
+    end = blob.find(b"\x00\x00", start)
+    while end != -1 and (end - start) % 2:
+        end = blob.find(b"\x00\x00", end + 1)
+    if end == -1:
+        end = len(blob) - (len(blob) - start) % 2
+    try:
+        # Decode straight from a slice of the buffer without copying it first
+        path = str(memoryview(blob)[start:end], "utf-16-le")
+    except UnicodeDecodeError:
+        path = ""
+    if re.match(r"^(?:[A-Za-z]:\\|\\\\)", path):
+        return path
+    # Unexpected layout; fall back to scanning the blob as text
+    return extract_legacy_path(blob)
+
+
+def extract_legacy_path(blob):
+    """Extract a file path by dropping NUL bytes and searching the remaining text"""
+    data = "".join(chr(b) for b in blob if b != 0)
+    match = re.search(r'(.:\\.+?)\\\\', data)
+    return match.group(1) if match else None
+
+
+class HistorySource:
+    """Where the gallery gets its list of wallpaper paths from"""
+
+    description = "wallpaper history"
+
+    def load_paths(self):
+        """Return the wallpaper paths, most recent first"""
+        raise NotImplementedError
+
+
+class RegistryHistorySource(HistorySource):
+    """Wallpaper history recorded by Windows in the TranscodedImageCache registry values"""
+
+    description = "Windows registry"
+
+    def blobs(self):
+        """Return the raw TranscodedImageCache values"""
+        if winreg is None:
+            raise RuntimeError("The Windows registry is not available on this platform")
+        blobs = []
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop") as reg_key:
+            for i in range(winreg.QueryInfoKey(reg_key)[1]):
+                name, value, _ = winreg.EnumValue(reg_key, i)
+                if "TranscodedImageCache" in name and isinstance(value, bytes):
+                    blobs.append(value)
+        return blobs
+
+    def load_paths(self):
+        """Decode every history blob into a path"""
+        paths = (parse_transcoded_image_cache(blob) for blob in self.blobs())
+        return [path for path in paths if path]
+
+
+class RecordedHistorySource(HistorySource):
+    """TranscodedImageCache blobs saved to a text file, one hex string per line"""
+
+    def __init__(self, recording_path):
+        """Remember which recording to read"""
+        self.recording_path = recording_path
+        self.description = os.path.basename(recording_path)
+
+    def load_paths(self):
+        """Decode every recorded blob into a path"""
+        paths = []
+        with open(self.recording_path, "r", encoding="ascii") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                path = parse_transcoded_image_cache(bytes.fromhex(line))
+                if path:
+                    paths.append(path)
+        return paths
+
+    @staticmethod
+    def record(blobs, recording_path):
+        """Save blobs, e.g. from RegistryHistorySource, so they can be replayed anywhere"""
+        with open(recording_path, "w", encoding="ascii") as f:
+            for blob in blobs:
+                f.write(blob.hex() + "\n")
+
+
+class DirectoryHistorySource(HistorySource):
+    """Images in a folder, or the paths listed in a text file, treated as the history"""
+
+    def __init__(self, location, recursive=True):
+        """Remember the folder or list file to read"""
+        self.location = location
+        self.recursive = recursive
+        self.description = location
+
+    def load_paths(self):
+        """List the images, newest first like the registry history"""
+        if os.path.isfile(self.location):
+            with open(self.location, "r", encoding="utf-8") as f:
+                return [line.strip() for line in f if line.strip()]
+
+        entries = []
+        for folder, subfolders, files in os.walk(self.location):
+            for file in files:
+                if file.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(folder, file)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+            if not self.recursive:
+                subfolders.clear()
+        entries.sort(reverse=True)
+        return [path for _, path in entries]
+
+
+def dominant_colors(images, bits=COLOR_QUANTIZATION_BITS):
+    """Return the dominant color of each image as a hex string, computed for the whole batch at once.
+
+    Colors are quantized to `bits` per channel so near-identical shades share a bin,
+    and the result is the mean color of the most populated bin.
+    """
+    if not images:
+        return []
+    levels = 1 << bits
+    bin_count = levels ** 3
+    pixel_arrays = [np.asarray(img.convert("RGB")).reshape(-1, 3) for img in images]
+    pixels = np.concatenate(pixel_arrays)
+    owners = np.repeat(np.arange(len(images)), [len(array) for array in pixel_arrays])
+
+    quantized = pixels.astype(np.int64) >> (8 - bits)
+    # One bin space per image so a single bincount covers the whole batch
+    bins = owners * bin_count + (quantized[:, 0] * levels + quantized[:, 1]) * levels + quantized[:, 2]
+    total_bins = len(images) * bin_count
+    counts = np.bincount(bins, minlength=total_bins).reshape(len(images), bin_count)
+    sums = np.stack(
+        [np.bincount(bins, weights=pixels[:, channel], minlength=total_bins) for channel in range(3)],
+        axis=-1,
+    ).reshape(len(images), bin_count, 3)
+
+    rows = np.arange(len(images))
+    top_bins = counts.argmax(axis=1)
+    means = sums[rows, top_bins] / counts[rows, top_bins][:, None]
+    return ['#{:02x}{:02x}{:02x}'.format(*color) for color in means.round().astype(int)]
+
+
+def difference_hash(image, hash_size=8):
+    """64-bit perceptual dHash: whether each pixel of a tiny grayscale copy is brighter than its right neighbour"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class MultiIndexHashTable:
+    """Multi-index hash table for sub-linear Hamming-distance lookups over 64-bit hashes.
+
+    Each hash is split into `chunks` 16-bit pieces with one exact-match table per piece.
+    Two hashes within `max_distance` must have some piece within max_distance // chunks
+    of each other, so a query only probes those few neighbouring keys in each table.
+    """
+
+    def __init__(self, max_distance=DUPLICATE_DISTANCE, chunks=4):
+        """Create one table per chunk position"""
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self.chunk_radius = max_distance // chunks
+        self.tables = [{} for _ in range(chunks)]
+        # Every bit pattern a chunk may differ by while still possibly matching
+        chunk_flips = [0]
+        for flips in range(1, self.chunk_radius + 1):
+            for bits in itertools.combinations(range(self.chunk_bits), flips):
+                chunk_flips.append(sum(1 << bit for bit in bits))
+        self.chunk_flips = chunk_flips
+        self.mask = (1 << self.chunk_bits) - 1
+
+    def split(self, value):
+        """Cut a hash into its chunk keys"""
+        return [(value >> (position * self.chunk_bits)) & self.mask for position in range(self.chunks)]
+
+    def add(self, value, item):
+        """Insert an item under its hash"""
+        for table, key in zip(self.tables, self.split(value)):
+            table.setdefault(key, []).append((value, item))
+
+    def query(self, value):
+        """Return every item whose hash is within max_distance of value"""
+        matches = {}
+        for table, key in zip(self.tables, self.split(value)):
+            for flip in self.chunk_flips:
+                for candidate, item in table.get(key ^ flip, ()):
+                    if (value ^ candidate).bit_count() <= self.max_distance:
+                        matches[item] = None
+        return list(matches)
+
+
+def group_near_duplicates(hashes, max_distance=DUPLICATE_DISTANCE):
+    """Group paths whose hashes are within max_distance of each other; singletons are dropped"""
+    table = MultiIndexHashTable(max_distance)
+    for path, value in hashes.items():
+        table.add(value, path)
+
+    # Union-find so chains of near matches end up in one group
+    parents = {path: path for path in hashes}
+
+    def find(path):
+        while parents[path] != path:
+            parents[path] = parents[parents[path]]
+            path = parents[path]
+        return path
+
+    for path, value in hashes.items():
+        for match in table.query(value):
+            root_a, root_b = find(path), find(match)
+            if root_a != root_b:
+                parents[root_b] = root_a
+
+    groups = {}
+    for path in hashes:
+        groups.setdefault(find(path), []).append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def split_around_keepers(ranked, hashes, max_distance=DUPLICATE_DISTANCE):
+    """Split a ranked group into clusters whose members are all within max_distance of their first (kept) path
+
+    Union-find chains near matches, so a gradual series of shots can end up in one group even
+    though its ends look nothing alike; only copies close to the kept image may be deleted for it.
+    """
+    clusters = []
+    while len(ranked) > 1:
+        keeper_hash = hashes[ranked[0]]
+        close = [path for path in ranked[1:] if (hashes[path] ^ keeper_hash).bit_count() <= max_distance]
+        if close:
+            clusters.append([ranked[0]] + close)
+        close = set(close)
+        ranked = [path for path in ranked[1:] if path not in close]
+    return clusters
+
+
+class ThumbnailCache:
+    """Persistent on-disk cache of gallery thumbnails keyed by path, mtime and size"""
+
+    def __init__(self, cache_dir=os.path.join(CACHE_ROOT, "thumbnails"), size=THUMBNAIL_SIZE):
+        """Create the cache directory if it does not exist yet"""
+        self.cache_dir = cache_dir
+        self.size = size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, image_path):
+        """Build a cache key that changes whenever the source file does"""
+        stat = os.stat(image_path)
+        identity = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size[0]}x{self.size[1]}"
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def cache_file(self, key):
+        """Location of the cached thumbnail for a key, sharded to keep directories small"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def load(self, image_path):
+        """Return the thumbnail for an image, decoding and storing it on a cache miss.
+
+        Safe to call from worker threads; never touches Tk.
+        """
+        cache_file = self.cache_file(self.key_for(image_path))
+        try:
+            with Image.open(cache_file) as cached:
+                cached.load()
+                return cached
+        except OSError:
+            pass
+
+        with Image.open(image_path) as img:
+            # thumbnail() lets JPEG decode at a reduced scale before resampling
+            img.thumbnail(self.size, Image.Resampling.LANCZOS)
+            thumbnail = img if img.mode in ("RGB", "RGBA") else img.convert("RGBA")
+            thumbnail.load()
+
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            # Write to a temporary name first so a crash never leaves a truncated thumbnail behind
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            thumbnail.save(temp_file, "PNG")
+            os.replace(temp_file, cache_file)
+        except OSError:
+            pass  # A read-only cache only costs us the speedup
+        return thumbnail
+
+    def sidecar_file(self, image_path, extension):
+        """Location of a small per-image value stored next to the thumbnail"""
+        return os.path.splitext(self.cache_file(self.key_for(image_path)))[0] + extension
+
+    def read_sidecar(self, image_path, extension):
+        """Return a cached per-image value, or None"""
+        try:
+            with open(self.sidecar_file(image_path, extension), "r", encoding="ascii") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def write_sidecar(self, image_path, extension, value):
+        """Remember a per-image value next to its thumbnail"""
+        sidecar_file = self.sidecar_file(image_path, extension)
+        try:
+            os.makedirs(os.path.dirname(sidecar_file), exist_ok=True)
+            with open(sidecar_file, "w", encoding="ascii") as f:
+                f.write(value)
+        except OSError:
+            pass
+
+    def load_color(self, image_path):
+        """Return the cached dominant color stored next to the thumbnail, or None"""
+        return self.read_sidecar(image_path, ".color")
+
+    def store_color(self, image_path, color):
+        """Remember the dominant color of an image next to its thumbnail"""
+        self.write_sidecar(image_path, ".color", color)
+
+    def difference_hash(self, image_path):
+        """Return the 64-bit dHash of an image, computing it from the thumbnail on a miss"""
+        cached = self.read_sidecar(image_path, ".dhash")
+        if cached is not None:
+            return int(cached, 16)
+        value = difference_hash(self.load(image_path))
+        self.write_sidecar(image_path, ".dhash", f"{value:016x}")
+        return value
+
+    def dominant_color(self, image_path, thumbnail=None):
+        """Return the dominant color of an image, computing it from the thumbnail on a miss"""
+        color = self.load_color(image_path)
+        if color is None:
+            if thumbnail is None:
+                thumbnail = self.load(image_path)
+            color = dominant_colors([thumbnail])[0]
+            self.store_color(image_path, color)
+        return color
+
+
+class TrashJournal:
+    """Moves deleted wallpapers into a trash folder and journals each batch so it can be undone"""
+
+    def __init__(self, trash_dir=os.path.join(CACHE_ROOT, "trash")):
+        """Create the trash folder; the journal is an append-only JSON-lines file inside it"""
+        self.trash_dir = trash_dir
+        self.journal_path = os.path.join(trash_dir, "journal.jsonl")
+        self.lock = threading.Lock()
+        os.makedirs(trash_dir, exist_ok=True)
+
+    def append(self, record):
+        """Add one record to the journal"""
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def read(self):
+        """Return every journal record, oldest first"""
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+
+    def trash(self, image_paths):
+        """Move files into a new trash batch. Returns (batch, moved paths, failures)."""
+        with self.lock:
+            batch = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1000000:06d}"
+            batch_dir = os.path.join(self.trash_dir, batch)
+            os.makedirs(batch_dir, exist_ok=True)
+            moved, failed = [], []
+            for number, image_path in enumerate(image_paths):
+                trashed = os.path.join(batch_dir, f"{number:05d}-{os.path.basename(image_path)}")
+                try:
+                    # Same-volume moves are instant renames; other volumes fall back to copy and delete
+                    shutil.move(image_path, trashed)
+                except OSError as e:
+                    failed.append((image_path, str(e)))
+                    continue
+                self.append({"action": "trash", "batch": batch, "original": image_path, "trashed": trashed, "time": time.time()})
+                moved.append(image_path)
+            return batch, moved, failed
+
+    def last_batch(self):
+        """Return the most recent batch that has not been undone, or None"""
+        restored = set()
+        for record in reversed(self.read()):
+            if record["action"] == "restore":
+                restored.add(record["batch"])
+            elif record["action"] == "trash" and record["batch"] not in restored:
+                return record["batch"]
+        return None
+
+    def restore(self, batch):
+        """Move every file of a batch back to where it came from. Returns (restored paths, failures)."""
+        with self.lock:
+            restored, failed = [], []
+            for record in self.read():
+                if record["action"] != "trash" or record["batch"] != batch:
+                    continue
+                try:
+                    if os.path.exists(record["original"]):
+                        raise FileExistsError(f"{record['original']} already exists")
+                    os.makedirs(os.path.dirname(record["original"]), exist_ok=True)
+                    shutil.move(record["trashed"], record["original"])
+                    restored.append(record["original"])
+                except OSError as e:
+                    failed.append((record["original"], str(e)))
+            self.append({"action": "restore", "batch": batch, "time": time.time()})
+            return restored, failed
+
+    def purge(self, retention_days=TRASH_RETENTION_DAYS):
+        """Permanently remove trash batches older than the retention period"""
+        with self.lock:
+            cutoff = time.time() - retention_days * 86400
+            records = self.read()
+            expired = {record["batch"] for record in records if record["action"] == "trash" and record["time"] < cutoff}
+            if not expired:
+                return
+            for batch in expired:
+                shutil.rmtree(os.path.join(self.trash_dir, batch), ignore_errors=True)
+            kept = [record for record in records if record["batch"] not in expired]
+            temp_path = self.journal_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for record in kept:
+                    f.write(json.dumps(record) + "\n")
+            os.replace(temp_path, self.journal_path)
+
+
+class SearchIndex:
+    """In-memory index of the wallpaper history used to filter the gallery as the user types"""
+
+    def __init__(self, paths):
+        """Precompute the lowercase text each query is matched against"""
+        self.paths = list(paths)
+        self.path_set = set(self.paths)
+        self.search_text = [path.lower() for path in self.paths]
+        # Paths are assumed to exist until the background check says otherwise
+        self.missing = set()
+        self.last_query = None
+        self.last_results = None
+
+    def search(self, query):
+        """Return the existing paths whose full path contains every whitespace-separated term"""
+        query = query.lower().strip()
+        if not query:
+            results = range(len(self.paths))
+        else:
+            # Typing more characters can only narrow the previous matches
+            if self.last_query and query.startswith(self.last_query):
+                candidates = self.last_results
+            else:
+                candidates = range(len(self.paths))
+            terms = query.split()
+            results = [i for i in candidates if all(term in self.search_text[i] for term in terms)]
+        self.last_query = query
+        self.last_results = results
+        return [self.paths[i] for i in results if self.paths[i] not in self.missing]
+
+    def remove(self, path):
+        """Drop a path from the index, e.g. after it was deleted"""
+        self.missing.add(path)
+
+    def check_existence(self):
+        """Return the set of paths that no longer exist. Runs on a background thread."""
+        return {path for path in self.paths if not os.path.exists(path)}
+
+
+class PollingWatcher:
+    """Portable change feed that diffs (mtime, size) snapshots of the watched files"""
+
+    def __init__(self, paths, callback, interval=POLL_INTERVAL):
+        """Watch `paths`; callback receives lists of (kind, path) from a background thread"""
+        self.paths = set(paths)
+        self.directories = {os.path.dirname(path) for path in self.paths}
+        self.callback = callback
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """Begin watching"""
+        self.thread.start()
+
+    def stop(self):
+        """Stop watching; the background thread exits at its next wake-up"""
+        self.stop_event.set()
+
+    def snapshot(self):
+        """Map every watched file that exists to its (mtime, size), one directory listing at a time"""
+        state = {}
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.path in self.paths:
+                            stat = entry.stat()
+                            state[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        return state
+
+    def run(self):
+        """Compare snapshots and report what changed in between"""
+        previous = self.snapshot()
+        while not self.stop_event.wait(self.interval):
+            current = self.snapshot()
+            events = [("deleted", path) for path in previous.keys() - current.keys()]
+            for path, state in current.items():
+                if path not in previous:
+                    events.append(("created", path))
+                elif previous[path] != state:
+                    events.append(("modified", path))
+            previous = current
+            if events:
+                self.callback(events)
+
+
+class InotifyWatcher:
+    """Linux change feed built on inotify, so nothing is rescanned while idle"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, paths, callback):
+        """Watch the directories holding `paths`; callback receives lists of (kind, path)"""
+        self.paths = set(paths)
+        self.callback = callback
+        self.stop_event = threading.Event()
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE
+        self.directories = {}
+        for directory in {os.path.dirname(path) for path in self.paths}:
+            watch = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if watch >= 0:
+                self.directories[watch] = directory
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """Begin watching"""
+        self.thread.start()
+
+    def stop(self):
+        """Stop watching; the background thread closes the descriptor on its way out"""
+        self.stop_event.set()
+
+    def run(self):
+        """Read batches of inotify events and translate them into (kind, path) pairs"""
+        try:
+            while not self.stop_event.is_set():
+                # Wake up regularly so stop() is noticed even when nothing changes
+                readable, _, _ = select.select([self.fd], [], [], 0.5)
+                if not readable:
+                    continue
+                buffer = os.read(self.fd, 64 * 1024)
+                events = []
+                offset = 0
+                while offset < len(buffer):
+                    watch, mask, _, length = self.EVENT_HEADER.unpack_from(buffer, offset)
+                    offset += self.EVENT_HEADER.size
+                    name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+                    offset += length
+                    path = os.path.join(self.directories.get(watch, ""), name)
+                    if path not in self.paths:
+                        continue
+                    if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        events.append(("deleted", path))
+                    else:
+                        events.append(("modified", path))
+                if events:
+                    self.callback(events)
+        finally:
+            os.close(self.fd)
+
+
+def create_watcher(paths, callback):
+    """Use inotify where available and fall back to polling everywhere else"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths, callback)
+        except (OSError, AttributeError):
+            pass  # No inotify (e.g. restricted libc); polling still works
+    return PollingWatcher(paths, callback)
+
+
+class GalleryTile:
+    """One reusable gallery card; the virtualized gallery keeps a small pool of these"""
+
+    def __init__(self, canvas, on_click, on_toggle):
+        """Build the card widgets once and place them on the canvas, hidden"""
+        self.path = None
+        self.selected = False
+        self.frame = ttk.Frame(canvas, style="Card.TFrame", width=TILE_SIZE[0], height=TILE_SIZE[1])
+        # Keep every card the same size regardless of title length
+        self.frame.pack_propagate(False)
+
+        # Thin strip tinted with the wallpaper's dominant color
+        self.accent = tk.Frame(self.frame, height=4, highlightthickness=0)
+        self.accent.pack(fill=tk.X, side=tk.TOP)
+
+        self.preview_label = ttk.Label(self.frame, style="Card.TLabel")
+        self.preview_label.pack(padx=8, pady=(8, 4))
+
+        self.title_label = ttk.Label(
+            self.frame,
+            style="CardTitle.TLabel",
+            wraplength=190,
+            anchor="center",
+            justify="center"
+        )
+        self.title_label.pack(fill=tk.X, padx=8)
+
+        self.hint_label = ttk.Label(self.frame, text="Click to delete", style="CardHint.TLabel", anchor="center")
+        self.hint_label.pack(side=tk.BOTTOM, fill=tk.X, padx=8, pady=(0, 8))
+
+        for widget in (self.frame, self.preview_label, self.title_label, self.hint_label):
+            widget.bind("<Button-1>", lambda event: self.path and on_click(self.path))
+            widget.bind("<Control-Button-1>", lambda event: self.path and on_toggle(self.path))
+
+        self.canvas = canvas
+        self.window = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+
+    def show(self, path, x, y, image, accent_color, selected=False):
+        """Point this card at a wallpaper and move it into position"""
+        if path != self.path:
+            self.path = path
+            filename = os.path.basename(path)
+            if len(filename) > 48:
+                filename = filename[:45] + "..."
+            self.title_label.configure(text=filename)
+        self.preview_label.configure(image=image)
+        self.accent.configure(bg=accent_color)
+        self.set_selected(selected)
+        self.canvas.coords(self.window, x, y)
+        self.canvas.itemconfigure(self.window, state="normal")
+
+    def set_selected(self, selected):
+        """Highlight the card while it is part of the multi-selection"""
+        if selected != self.selected:
+            self.selected = selected
+            self.frame.configure(style="SelectedCard.TFrame" if selected else "Card.TFrame")
+            self.hint_label.configure(text="Selected" if selected else "Click to delete")
+
+    def hide(self):
+        """Hide a card that has no wallpaper to show"""
+        self.path = None
+        self.canvas.itemconfigure(self.window, state="hidden")
+
 
 class WallpaperManager:
     """Main application class for managing Windows wallpaper history"""
     
-    def __init__(self, root):
+    def __init__(self, root, history_source=None):
         """Initialize the application with UI components and event bindings"""
         self.root = root
-        self.thumbnail_refs = {}
+        self.history_source = history_source or RegistryHistorySource()
+        self.thumbnail_refs = OrderedDict()  # LRU of PhotoImages, bounded by remember_thumbnail
+        self.preview_labels = {}
+        self.visible_tiles = {}
+        self.tile_colors = {}
+        self.visible_paths = []
+        self.tile_pool = []
+        self.pending_thumbnails = set()
+        self.selected_paths = set()
+        self.trash = TrashJournal()
+        self.delete_in_progress = False
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnail")
         self.resize_job = None
+        self.watcher = None
         self.setup_window()
         self.setup_colors()
         self.configure_styles()
         self.create_layout()
         self.initialize_components()
+        self.placeholder_image = ImageTk.PhotoImage(Image.new("RGB", THUMBNAIL_SIZE, self.colors["border"]))
         self.image_cache = self.get_image_cache()
-        self.populate_image_list()
+        self.build_search_index()
+        # Build the gallery once the main loop runs so worker threads can hand results back
+        self.root.after_idle(self.populate_image_list)
         
     def setup_window(self):
         """Configure the main application window"""
@@ -63,6 +782,7 @@ class WallpaperManager:
         self.style.configure("TLabel", background=self.colors["bg_light"], foreground=self.colors["text_dark"])
         self.style.configure("TButton", background=self.colors["neutral"], foreground=self.colors["text_light"], padding=5)
         self.style.configure("Card.TFrame", background=self.colors["bg_dark"], relief="solid", borderwidth=1)
+        self.style.configure("SelectedCard.TFrame", background=self.colors["primary_dark"], relief="solid", borderwidth=1)
         self.style.configure("Card.TLabel", background=self.colors["bg_dark"])
         self.style.configure("CardTitle.TLabel", background=self.colors["bg_dark"], foreground=self.colors["text_light"], font=("Segoe UI", 10, "bold"))
         self.style.configure("CardHint.TLabel", background=self.colors["bg_dark"], foreground=self.colors["text_dark"], font=("Segoe UI", 9))
@@ -130,7 +850,7 @@ class WallpaperManager:
 
         self.instructions = ttk.Label(
             self.header_frame,
-            text="Click a wallpaper thumbnail to preview the delete prompt.",
+            text="Click a wallpaper thumbnail to preview the delete prompt. Ctrl+click to select several.",
             anchor="center",
             padding=(0, 0, 0, 8)
         )
@@ -193,13 +913,17 @@ class WallpaperManager:
 
         self.gallery_scrollbar = ttk.Scrollbar(self.content_frame, orient=tk.VERTICAL, command=self.gallery_canvas.yview)
         self.gallery_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.gallery_canvas.configure(yscrollcommand=self.gallery_scrollbar.set)
+        self.gallery_canvas.configure(yscrollcommand=self.on_gallery_scroll)
 
-        self.gallery_inner = ttk.Frame(self.gallery_canvas)
-        self.gallery_window = self.gallery_canvas.create_window((0, 0), window=self.gallery_inner, anchor="nw")
+        self.empty_state = ttk.Label(
+            self.gallery_canvas,
+            text="No matching wallpapers found.",
+            padding=24,
+            anchor="center",
+        )
+        self.empty_window = self.gallery_canvas.create_window(0, 0, window=self.empty_state, anchor="n", state="hidden")
 
-        self.gallery_inner.bind("<Configure>", self.update_gallery_scrollregion)
-        self.gallery_canvas.bind("<Configure>", self.resize_gallery_window)
+        self.gallery_canvas.bind("<Configure>", self.schedule_gallery_refresh)
         self.gallery_canvas.bind_all("<MouseWheel>", self.on_mousewheel)
         
     def create_action_buttons(self):
@@ -210,6 +934,9 @@ class WallpaperManager:
         # Keep the footer minimal because the gallery items are the primary controls.
         button_data = [
             ("Refresh List", self.refresh_list, "🔄", "Primary.TButton"),
+            ("Find Duplicates", self.find_duplicates, "🔍", "Primary.TButton"),
+            ("Delete Selected", self.delete_selected, "🗑", "Danger.TButton"),
+            ("Undo Delete", self.undo_delete, "↩", "TButton"),
         ]
         
         # Create buttons with consistent styling
@@ -225,75 +952,199 @@ class WallpaperManager:
             
     def initialize_components(self):
         """Set up event bindings for interactive components"""
-        self.root.bind("<Configure>", self.schedule_gallery_refresh)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<Escape>", lambda event: self.clear_selection())
+        threading.Thread(target=self.trash.purge, daemon=True).start()
+
+    def on_close(self):
+        """Stop background thumbnail work and close the window"""
+        self.thumbnail_executor.shutdown(wait=False, cancel_futures=True)
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.root.destroy()
             
     def get_image_cache(self):
-        """Retrieve wallpaper image paths from Windows Registry"""
+        """Retrieve wallpaper image paths from the configured history source"""
         image_cache = []
         try:
-            reg_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop")
-            for i in range(winreg.QueryInfoKey(reg_key)[1]):
-                name, value, _ = winreg.EnumValue(reg_key, i)
-                if "TranscodedImageCache" in name:
-                    readable = self.hex_to_ascii(value)
-                    path = self.extract_path(readable)
-                    if path:
-                        image_cache.append(path)
-            
+            image_cache = self.history_source.load_paths()
+
             # Update status bar
             self.status_bar.config(text=f"Found {len(image_cache)} wallpapers in history")
         except Exception as e:
-            messagebox.showerror("Registry Error", f"Failed to read wallpaper registry: {e}")
+            messagebox.showerror("History Error", f"Failed to read wallpaper history from {self.history_source.description}: {e}")
             self.status_bar.config(text="Error reading wallpaper history")
         return image_cache
 
-    def hex_to_ascii(self, hex_data):
-        """Convert hex data from registry to ASCII string"""
-        return ''.join(chr(b) for b in hex_data if b != 0)
-
-    def extract_path(self, data):
-        """Extract file path from registry data using regex"""
-        match = re.search(r'(.:\\.+?)\\\\', data)
-        return match.group(1) if match else None
-
-    def populate_image_list(self):
+    def populate_image_list(self, keep_scroll=False):
         """Fill the gallery with wallpaper previews."""
-        for child in self.gallery_inner.winfo_children():
-            child.destroy()
-        self.thumbnail_refs.clear()
-
-        search_text = self.search_var.get().lower().strip()
-        visible_paths = []
-        for path in self.image_cache:
-            if not os.path.exists(path):
-                continue
-            filename = os.path.basename(path)
-            if not search_text or search_text in filename.lower() or search_text in path.lower():
-                visible_paths.append(path)
+        visible_paths = self.search_index.search(self.search_var.get())
+
+        self.visible_paths = visible_paths
+        if not keep_scroll:
+            self.gallery_canvas.yview_moveto(0)
+        self.layout_gallery()
 
         if not visible_paths:
-            empty_state = ttk.Label(
-                self.gallery_inner,
-                text="No matching wallpapers found.",
-                padding=24,
-                anchor="center",
-            )
-            empty_state.grid(row=0, column=0, sticky="nsew")
             self.status_bar.config(text="No wallpapers to display")
-            self.update_gallery_scrollregion()
-            return
+        else:
+            self.status_bar.config(text=f"Showing {len(visible_paths)} wallpaper previews")
+
+    def layout_gallery(self):
+        """Size the scroll region for every visible path and render the rows on screen."""
+        width = max(self.gallery_canvas.winfo_width(), 1)
+        rows = -(-len(self.visible_paths) // self.get_gallery_columns())
+        self.gallery_canvas.configure(scrollregion=(0, 0, width, max(rows * ROW_HEIGHT, 1)))
+
+        if self.visible_paths:
+            self.gallery_canvas.itemconfigure(self.empty_window, state="hidden")
+        else:
+            self.gallery_canvas.coords(self.empty_window, width // 2, 0)
+            self.gallery_canvas.itemconfigure(self.empty_window, state="normal")
+        self.render_visible_tiles()
 
+    def render_visible_tiles(self):
+        """Assign pooled tiles to the rows inside the viewport; nothing is created per wallpaper."""
         columns = self.get_gallery_columns()
-        for column in range(columns):
-            self.gallery_inner.columnconfigure(column, weight=1)
+        column_width = max(self.gallery_canvas.winfo_width(), 1) / columns
+        top = self.gallery_canvas.canvasy(0)
+        height = self.gallery_canvas.winfo_height()
+        first_row = max(int(top // ROW_HEIGHT), 0)
+        # One spare row below the viewport so partially visible rows are always filled
+        last_row = int((top + height) // ROW_HEIGHT) + 1
+
+        first_index = first_row * columns
+        indexes = range(first_index, min((last_row + 1) * columns, len(self.visible_paths)))
+        while len(self.tile_pool) < len(indexes):
+            self.tile_pool.append(GalleryTile(self.gallery_canvas, self.confirm_delete, self.toggle_selection))
+
+        self.preview_labels = {}
+        self.visible_tiles = {}
+        for tile, index in zip(self.tile_pool, indexes):
+            path = self.visible_paths[index]
+            row, column = divmod(index, columns)
+            x = column * column_width + (column_width - TILE_SIZE[0]) / 2
+            y = row * ROW_HEIGHT + 8
+            # Show a placeholder until the background loader delivers the real thumbnail
+            thumbnail = self.thumbnail_refs.get(path)
+            if thumbnail is not None:
+                self.thumbnail_refs.move_to_end(path)
+            tile.show(
+                path, x, y,
+                thumbnail or self.placeholder_image,
+                self.tile_colors.get(path, self.colors["border"]),
+                path in self.selected_paths,
+            )
+            self.preview_labels[path] = tile.preview_label
+            self.visible_tiles[path] = tile
+            if thumbnail is None:
+                self.request_thumbnail(path)
+        for tile in self.tile_pool[len(indexes):]:
+            tile.hide()
 
-        for index, path in enumerate(visible_paths):
-            row = index // columns
-            column = index % columns
-            self.create_thumbnail_tile(path, row, column)
+    def on_gallery_scroll(self, first, last):
+        """Keep the scrollbar in sync and render whatever rows scrolled into view."""
+        self.gallery_scrollbar.set(first, last)
+        self.render_visible_tiles()
 
-        self.status_bar.config(text=f"Showing {len(visible_paths)} wallpaper previews")
-        self.update_gallery_scrollregion()
+    def build_search_index(self):
+        """Index the current wallpaper history and check which files still exist in the background"""
+        index = SearchIndex(self.image_cache)
+        self.search_index = index
+        threading.Thread(target=self.check_index_existence, args=(index,), daemon=True).start()
+        threading.Thread(target=self.compute_gallery_colors, args=(index,), daemon=True).start()
+        self.start_watcher(index)
+
+    def start_watcher(self, index):
+        """Watch the folders holding the history so the gallery stays live without a refresh"""
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.watcher = create_watcher(index.paths, lambda events: self.queue_file_changes(index, events))
+        self.watcher.start()
+
+    def queue_file_changes(self, index, events):
+        """Watcher thread: hand a batch of file changes to the UI thread"""
+        try:
+            self.root.after(0, self.apply_file_changes, index, events)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed
+
+    def apply_file_changes(self, index, events):
+        """Update only the index entries and tiles affected by a batch of file changes"""
+        if index is not self.search_index:
+            return
+        deleted = set()
+        reappeared = False
+        for kind, path in events:
+            if path not in index.path_set:
+                continue
+            if kind == "deleted":
+                index.missing.add(path)
+                deleted.add(path)
+                continue
+            if path in index.missing:
+                index.missing.discard(path)
+                reappeared = True
+            # The file changed, so its thumbnail and color are stale
+            self.thumbnail_refs.pop(path, None)
+            self.tile_colors.pop(path, None)
+            if path in self.preview_labels:
+                self.request_thumbnail(path)
+
+        if reappeared:
+            self.populate_image_list(keep_scroll=True)
+        elif deleted:
+            self.visible_paths = [path for path in self.visible_paths if path not in deleted]
+            self.layout_gallery()
+        if deleted:
+            self.status_bar.config(text=f"{len(deleted)} wallpapers disappeared from disk")
+
+    def check_index_existence(self, index):
+        """Worker thread: stat every indexed path without blocking the UI"""
+        missing = index.check_existence()
+        try:
+            self.root.after(0, self.apply_index_existence, index, missing)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed while we were checking
+
+    def apply_index_existence(self, index, missing):
+        """Hide wallpapers whose files have disappeared"""
+        if index is not self.search_index or not missing:
+            return
+        index.missing.update(missing)
+        self.populate_image_list(keep_scroll=True)
+
+    def compute_gallery_colors(self, index):
+        """Worker thread: work out dominant colors for the whole history in vectorized batches"""
+        for start in range(0, len(index.paths), COLOR_BATCH_SIZE):
+            if index is not self.search_index:
+                return  # The history was reloaded; a newer pass has taken over
+            colors = {}
+            uncolored = []
+            for path in index.paths[start:start + COLOR_BATCH_SIZE]:
+                try:
+                    color = self.thumbnail_cache.load_color(path)
+                    if color is None:
+                        uncolored.append((path, self.thumbnail_cache.load(path)))
+                    else:
+                        colors[path] = color
+                except Exception:
+                    continue  # Missing or unreadable files are handled by the gallery itself
+            for (path, _), color in zip(uncolored, dominant_colors([thumb for _, thumb in uncolored])):
+                self.thumbnail_cache.store_color(path, color)
+                colors[path] = color
+            try:
+                self.root.after(0, self.apply_tile_colors, colors)
+            except (RuntimeError, tk.TclError):
+                return  # The window was closed
+
+    def apply_tile_colors(self, colors):
+        """Tint the accent strip of every visible tile whose color just became known"""
+        self.tile_colors.update(colors)
+        for path, color in colors.items():
+            tile = self.visible_tiles.get(path)
+            if tile is not None:
+                tile.accent.configure(bg=color)
 
     def filter_gallery(self, *args):
         """Filter the wallpaper gallery based on search text."""
@@ -307,71 +1158,108 @@ class WallpaperManager:
     def get_gallery_columns(self):
         """Calculate the number of thumbnail columns to show."""
         width = max(self.gallery_canvas.winfo_width(), 1)
-        return max(1, width // 230)
+        return max(1, width // COLUMN_WIDTH)
 
-    def create_thumbnail_tile(self, image_path, row, column):
-        """Create a clickable preview tile for one wallpaper."""
-        filename = os.path.basename(image_path)
-
-        tile = ttk.Frame(self.gallery_inner, style="Card.TFrame")
-        tile.grid(row=row, column=column, padx=8, pady=8, sticky="nsew")
+    def request_thumbnail(self, image_path):
+        """Queue a thumbnail for decoding on the worker pool"""
+        if image_path in self.pending_thumbnails:
+            return
+        self.pending_thumbnails.add(image_path)
+        self.thumbnail_executor.submit(self.load_thumbnail, image_path)
 
-        preview_size = (180, 120)
+    def load_thumbnail(self, image_path):
+        """Worker thread: load or decode one thumbnail and hand it to the UI thread"""
+        if image_path not in self.visible_tiles:
+            # Scrolled past before a worker got to it; the UI thread decides whether it is still wanted
+            try:
+                self.root.after(0, self.skip_thumbnail, image_path)
+            except (RuntimeError, tk.TclError):
+                pass
+            return
         try:
-            img = Image.open(image_path)
-            img.thumbnail(preview_size, Image.Resampling.LANCZOS)
-            thumbnail = ImageTk.PhotoImage(img)
+            thumbnail = self.thumbnail_cache.load(image_path)
+            color = self.thumbnail_cache.dominant_color(image_path, thumbnail)
         except Exception:
-            fallback = Image.new("RGB", preview_size, self.colors["border"])
-            thumbnail = ImageTk.PhotoImage(fallback)
-
-        self.thumbnail_refs[image_path] = thumbnail
+            thumbnail, color = None, None
+        try:
+            self.root.after(0, self.apply_thumbnail, image_path, thumbnail, color)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed while we were decoding
 
-        preview_label = ttk.Label(tile, image=thumbnail, style="Card.TLabel")
-        preview_label.pack(padx=8, pady=(8, 4))
+    def skip_thumbnail(self, image_path):
+        """Clear the pending mark of a skipped job, queueing it again if its tile scrolled back into view"""
+        self.pending_thumbnails.discard(image_path)
+        if image_path in self.visible_tiles:
+            self.request_thumbnail(image_path)
 
-        title_label = ttk.Label(
-            tile,
-            text=filename,
-            style="CardTitle.TLabel",
-            wraplength=190,
-            anchor="center",
-            justify="center"
-        )
-        title_label.pack(fill=tk.X, padx=8)
+    def apply_thumbnail(self, image_path, thumbnail, color=None):
+        """Swap the placeholder of a tile for its finished thumbnail"""
+        self.pending_thumbnails.discard(image_path)
+        if thumbnail is None:
+            thumbnail = Image.new("RGB", THUMBNAIL_SIZE, self.colors["border"])
+        photo = ImageTk.PhotoImage(thumbnail)
+        self.remember_thumbnail(image_path, photo)
 
-        hint_label = ttk.Label(tile, text="Click to delete", style="CardHint.TLabel", anchor="center")
-        hint_label.pack(fill=tk.X, padx=8, pady=(0, 8))
+        preview_label = self.preview_labels.get(image_path)
+        if preview_label is not None:
+            preview_label.configure(image=photo)
+        if color is not None:
+            self.apply_tile_colors({image_path: color})
 
-        for widget in (tile, preview_label, title_label, hint_label):
-            widget.bind("<Button-1>", lambda event, path=image_path: self.confirm_delete(path))
+    def remember_thumbnail(self, image_path, photo):
+        """Keep a PhotoImage alive, evicting the least recently shown ones beyond a few pools' worth"""
+        self.thumbnail_refs[image_path] = photo
+        self.thumbnail_refs.move_to_end(image_path)
+        limit = THUMBNAIL_MEMORY_POOLS * max(len(self.tile_pool), 1)
+        # Tk drops an image once its last reference goes, so never evict one a tile is showing
+        for path in list(self.thumbnail_refs):
+            if len(self.thumbnail_refs) <= limit:
+                break
+            if path not in self.visible_tiles:
+                del self.thumbnail_refs[path]
 
     def schedule_gallery_refresh(self, event=None):
         """Debounce layout refreshes while the window is resizing."""
-        if event is not None and event.widget is not self.root:
-            return
         if self.resize_job is not None:
             self.root.after_cancel(self.resize_job)
         self.resize_job = self.root.after(120, self.refresh_gallery_layout)
 
     def refresh_gallery_layout(self):
-        """Rebuild the gallery after a resize so thumbnails stay evenly spaced."""
+        """Re-place the existing tiles after a resize so thumbnails stay evenly spaced."""
         self.resize_job = None
-        self.populate_image_list()
-
-    def resize_gallery_window(self, event):
-        """Keep the inner frame aligned to the canvas width."""
-        self.gallery_canvas.itemconfigure(self.gallery_window, width=event.width)
-
-    def update_gallery_scrollregion(self, event=None):
-        """Keep the canvas scroll region in sync with the content size."""
-        self.gallery_canvas.configure(scrollregion=self.gallery_canvas.bbox("all"))
+        self.layout_gallery()
 
     def on_mousewheel(self, event):
         """Allow scrolling through the gallery with the mouse wheel."""
         if event.widget == self.gallery_canvas or str(event.widget).startswith(str(self.gallery_canvas)):
             self.gallery_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
 
+    def toggle_selection(self, image_path):
+        """Add a wallpaper to the multi-selection, or take it out again"""
+        if image_path in self.selected_paths:
+            self.selected_paths.discard(image_path)
+        else:
+            self.selected_paths.add(image_path)
+        tile = self.visible_tiles.get(image_path)
+        if tile is not None:
+            tile.set_selected(image_path in self.selected_paths)
+        self.status_bar.config(text=f"{len(self.selected_paths)} wallpapers selected")
+
+    def clear_selection(self):
+        """Deselect every wallpaper"""
+        self.selected_paths.clear()
+        for tile in self.visible_tiles.values():
+            tile.set_selected(False)
+        self.status_bar.config(text="Selection cleared")
+
+    def delete_selected(self):
+        """Move every selected wallpaper to the trash after one confirmation"""
+        if not self.selected_paths:
+            self.status_bar.config(text="Ctrl+click wallpapers to select them first")
+            return
+        if messagebox.askyesno("Delete Wallpapers", f"Move {len(self.selected_paths)} selected wallpapers to the trash?"):
+            self.delete_wallpapers(sorted(self.selected_paths))
+
     def confirm_delete(self, image_path):
         """Prompt before deleting a wallpaper from the gallery."""
         if not os.path.exists(image_path):
@@ -389,52 +1277,183 @@ class WallpaperManager:
         
     def get_dominant_color(self, image_path):
         """Get the dominant color from an image to match UI elements"""
+        if image_path in self.tile_colors:
+            return self.tile_colors[image_path]
         try:
-            img = Image.open(image_path)
-            img = img.resize((100, 100))  # Resize for faster processing
-            img = img.convert('RGB')
-            
-            # Get all pixels
-            pixels = list(img.getdata())
-            
-            # Count colors
-            color_count = {}
-            for pixel in pixels:
-                if pixel in color_count:
-                    color_count[pixel] += 1
-                else:
-                    color_count[pixel] = 1
-            
-            # Find dominant color
-            dominant_color = max(color_count.items(), key=lambda x: x[1])[0]
-            
-            # Convert to hex
-            hex_color = '#{:02x}{:02x}{:02x}'.format(*dominant_color)
-            
-            return hex_color
-        except:
-            return "#3498db"  # Default color on error
+            return self.thumbnail_cache.dominant_color(image_path)
+        except Exception:
+            return DEFAULT_ACCENT_COLOR  # Default color on error
 
     def refresh_list(self):
-        """Refresh the wallpaper list from registry"""
+        """Refresh the wallpaper list from the history source"""
         self.image_cache = self.get_image_cache()
+        self.build_search_index()
         self.populate_image_list()
         self.status_bar.config(text=f"Refreshed wallpaper list - found {len(self.image_cache)} items")
 
-    def delete_wallpaper(self, image_path):
-        """Delete the selected wallpaper file."""
-        filename = os.path.basename(image_path)
+    def find_duplicates(self):
+        """Hash the whole history in the background and show groups of near-duplicates"""
+        paths = list(self.search_index.search(""))
+        self.status_bar.config(text=f"Looking for duplicates among {len(paths)} wallpapers...")
+        threading.Thread(target=self.compute_duplicate_groups, args=(paths,), daemon=True).start()
+
+    def compute_duplicate_groups(self, paths):
+        """Worker thread: hash every wallpaper and group the near-identical ones"""
+        hashes = {}
+        for done, path in enumerate(paths, start=1):
+            try:
+                hashes[path] = self.thumbnail_cache.difference_hash(path)
+            except Exception:
+                continue  # Unreadable files cannot be compared
+            if done % 200 == 0:
+                try:
+                    self.root.after(0, self.status_bar.config, {"text": f"Hashed {done} of {len(paths)} wallpapers..."})
+                except (RuntimeError, tk.TclError):
+                    return  # The window was closed
 
+        groups = []
+        for group in group_near_duplicates(hashes):
+            details = []
+            for path in group:
+                try:
+                    with Image.open(path) as img:
+                        resolution = img.size
+                    details.append((path, resolution, os.path.getsize(path)))
+                except Exception:
+                    continue
+            if len(details) > 1:
+                # Keep the highest resolution copy, then the largest file
+                details.sort(key=lambda item: (item[1][0] * item[1][1], item[2]), reverse=True)
+                by_path = {item[0]: item for item in details}
+                for cluster in split_around_keepers([item[0] for item in details], hashes):
+                    groups.append([by_path[path] for path in cluster])
         try:
-            os.remove(image_path)
-            if image_path in self.image_cache:
-                self.image_cache.remove(image_path)
-            self.thumbnail_refs.pop(image_path, None)
-            self.populate_image_list()
-            self.status_bar.config(text=f"Deleted: {filename}")
+            self.root.after(0, self.show_duplicate_groups, groups)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed while we were hashing
+
+    def show_duplicate_groups(self, groups):
+        """List near-duplicate groups and offer to delete every copy but the best one"""
+        if not groups:
+            self.status_bar.config(text="No duplicate wallpapers found")
+            messagebox.showinfo("Duplicates", "No duplicate wallpapers found.")
+            return
+
+        redundant = [path for group in groups for path, _, _ in group[1:]]
+        wasted = sum(size for group in groups for _, _, size in group[1:])
+        self.status_bar.config(text=f"Found {len(groups)} duplicate groups ({len(redundant)} extra copies)")
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Duplicate Wallpapers")
+        dialog.geometry("820x480")
+        dialog.configure(bg=self.colors["bg_light"])
+
+        summary = ttk.Label(
+            dialog,
+            text=f"{len(groups)} groups, {len(redundant)} extra copies using {wasted / (1024 * 1024):.1f} MB. "
+                 "The first file in each group is kept.",
+            padding=10,
+        )
+        summary.pack(fill=tk.X)
+
+        tree = ttk.Treeview(dialog, columns=("resolution", "size"), show="tree headings")
+        tree.heading("#0", text="File")
+        tree.heading("resolution", text="Resolution")
+        tree.heading("size", text="Size")
+        tree.column("#0", width=560)
+        tree.column("resolution", width=110, anchor="center")
+        tree.column("size", width=100, anchor="e")
+        for number, group in enumerate(groups, start=1):
+            parent = tree.insert("", tk.END, text=f"Group {number} ({len(group)} files)", open=True)
+            for position, (path, resolution, size) in enumerate(group):
+                label = f"{'Keep' if position == 0 else 'Delete'}: {path}"
+                tree.insert(parent, tk.END, text=label, values=(f"{resolution[0]}x{resolution[1]}", f"{size / 1024:.0f} KB"))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+
+        def delete_redundant():
+            if messagebox.askyesno("Delete Duplicates", f"Move {len(redundant)} duplicate wallpapers to the trash?", parent=dialog):
+                dialog.destroy()
+                self.delete_wallpapers(redundant)
+
+        delete_btn = ttk.Button(dialog, text="🗑 Delete Duplicates", command=delete_redundant, style="Danger.TButton")
+        delete_btn.pack(side=tk.RIGHT, padx=10, pady=10)
+
+    def delete_wallpapers(self, image_paths):
+        """Move several wallpapers to the trash on a worker thread and refresh the gallery once."""
+        if self.delete_in_progress:
+            self.status_bar.config(text="Please wait for the current delete to finish")
+            return
+        self.delete_in_progress = True
+        self.status_bar.config(text=f"Moving {len(image_paths)} wallpapers to the trash...")
+        threading.Thread(target=self.run_trash_job, args=(list(image_paths),), daemon=True).start()
+
+    def run_trash_job(self, image_paths):
+        """Worker thread: move files to the trash and report back once"""
+        try:
+            batch, moved, failed = self.trash.trash(image_paths)
         except Exception as e:
-            messagebox.showerror("Delete Error", f"Failed to delete file: {e}")
-            self.status_bar.config(text="Error deleting file")
+            batch, moved, failed = None, [], [(path, str(e)) for path in image_paths]
+        try:
+            self.root.after(0, self.finish_delete, moved, failed)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed; the journal still records what happened
+
+    def finish_delete(self, moved, failed):
+        """Drop trashed wallpapers from the index and the view in a single update"""
+        self.delete_in_progress = False
+        removed = set(moved)
+        self.image_cache = [path for path in self.image_cache if path not in removed]
+        self.search_index.missing.update(removed)
+        self.selected_paths -= removed
+        for path in removed:
+            self.thumbnail_refs.pop(path, None)
+        self.visible_paths = [path for path in self.visible_paths if path not in removed]
+        self.layout_gallery()
+
+        if len(moved) == 1:
+            self.status_bar.config(text=f"Deleted: {os.path.basename(moved[0])} (Undo Delete restores it)")
+        else:
+            self.status_bar.config(text=f"Moved {len(moved)} wallpapers to the trash (Undo Delete restores them)")
+        if failed:
+            details = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in failed[:10])
+            messagebox.showerror("Delete Error", f"Failed to delete {len(failed)} files:\n\n{details}")
+
+    def undo_delete(self):
+        """Restore the most recent batch of deleted wallpapers from the trash"""
+        if self.delete_in_progress:
+            self.status_bar.config(text="Please wait for the current delete to finish")
+            return
+        self.delete_in_progress = True
+        self.status_bar.config(text="Restoring wallpapers from the trash...")
+        threading.Thread(target=self.run_restore_job, daemon=True).start()
+
+    def run_restore_job(self):
+        """Worker thread: move the last trashed batch back into place"""
+        batch = self.trash.last_batch()
+        restored, failed = self.trash.restore(batch) if batch else ([], [])
+        try:
+            self.root.after(0, self.finish_restore, batch, restored, failed)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed
+
+    def finish_restore(self, batch, restored, failed):
+        """Bring restored wallpapers back into the gallery in a single update"""
+        self.delete_in_progress = False
+        if batch is None:
+            self.status_bar.config(text="Nothing to undo")
+            return
+        known = set(self.image_cache)
+        self.image_cache.extend(path for path in restored if path not in known)
+        self.search_index.missing.difference_update(restored)
+        self.populate_image_list(keep_scroll=True)
+        self.status_bar.config(text=f"Restored {len(restored)} wallpapers")
+        if failed:
+            details = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in failed[:10])
+            messagebox.showerror("Undo Error", f"Failed to restore {len(failed)} files:\n\n{details}")
+
+    def delete_wallpaper(self, image_path):
+        """Move the selected wallpaper file to the trash."""
+        self.delete_wallpapers([image_path])
 
     def show_tooltip(self, message):
         """Display a temporary tooltip message"""
@@ -463,7 +1482,30 @@ class WallpaperManager:
         self.root.after(1500, tooltip.destroy)
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Browse and clean up the desktop wallpaper history.")
+    parser.add_argument("--folder", help="Use the images in this folder (or the paths listed in this file) as the history")
+    parser.add_argument("--recorded", help="Replay TranscodedImageCache blobs saved with --record")
+    parser.add_argument("--record", help="Save the registry history blobs to this file and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        blobs = RegistryHistorySource().blobs()
+        RecordedHistorySource.record(blobs, args.record)
+        print(f"Recorded {len(blobs)} history entries to {args.record}")
+        return
+
+    if args.recorded:
+        history_source = RecordedHistorySource(args.recorded)
+    elif args.folder:
+        history_source = DirectoryHistorySource(args.folder)
+    else:
+        history_source = RegistryHistorySource()
+
     root = tk.Tk()
-    app = WallpaperManager(root)
-    root.mainloop()
\ No newline at end of file
+    app = WallpaperManager(root, history_source)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file